@@ -1 +1,4 @@
-__all__ = ["max_summary", "merge", "read_avz", "read_key"]
\ No newline at end of file
+__version__ = "0.2.0"
+__all__ = ["benchmark", "fatigue", "force_history", "manifest", "max_summary",
+           "merge", "model_xml", "read_avz", "read_key", "synthetic",
+           "workbook"]
@@ -1,13 +1,30 @@
+import copy
 import math
+import numpy as np
 import pandas as pd
 from util import rotate, cartesian
 
+# Attributes that make_frame leaves for the anchor lines
+FRAME_STATE = [
+    "node_id", "edge_id", "node_index", "node_names", "node_ids",
+    "node_pos", "node_dof", "edge_index", "edge_names", "edge_ids",
+    "edge_nodes"
+]
+
+
 class Config:
 
-    def __init__(self, config_path):
-        config = pd.read_excel(config_path, sheet_name=["Ramme", "Anker"])
-        self.frame_config = config["Ramme"]
-        self.anchor_config = config["Anker"]
+    def __init__(self, config_path=None, frame_config=None,
+                 anchor_config=None):
+        '''Model from the Ramme and Anker sheets of the Excel file at
+        config_path, or from frame_config and anchor_config, the same
+        sheets as DataFrames.'''
+        if config_path is not None:
+            config = pd.read_excel(config_path, sheet_name=["Ramme", "Anker"])
+            frame_config = config["Ramme"]
+            anchor_config = config["Anker"]
+        self.frame_config = frame_config
+        self.anchor_config = anchor_config
         # Encapsulate input values
         self.num_rows = int(self.frame_config.iloc[0, 1])
         self.num_cols = int(self.frame_config.iloc[1, 1])
@@ -25,28 +42,119 @@ class Config:
         # Unique IDs
         self.node_id = 1
         self.edge_id = 1
-        # Make dictionaries
-        self.nodes = {}  # Contains pos, id and dof
-        self.edges = {}  # Contains edge and edge_id
+        # Node and edge tables, one row per node or edge, in order of
+        # creation. Lists while building, arrays after add_node_edges
+        self.node_index = {}  # Row of each node name
+        self.node_names = []
+        self.node_ids = []    # Contains id, pos and dof
+        self.node_pos = []
+        self.node_dof = []
+        self.edge_index = {}  # Row of each edge name
+        self.edge_names = []
+        self.edge_ids = []    # Contains edge_id and rows of edge nodes,
+        self.edge_nodes = []  # -1 for edges without nodes
         self.add_node_edges()
 
     def add_node_edges(self):
+        self.make_frame()
+        self.make_anchor_lines()
+        self.make_arrays()
+
+    def make_frame(self):
+        '''Make frame, hane and slings, and keep a copy of the state after
+        them for with_anchors.'''
         self.make_frame_nodes()
         self.make_frame_egdes()
         self.make_hane_edges()
         self.make_slings_edges()
-        self.make_anchor_lines()
+        self.frame_state = {key: copy.copy(getattr(self, key))
+                            for key in FRAME_STATE}
+
+    def with_anchors(self, anchor_config):
+        '''Model with the frame of this one and the anchor lines of
+        anchor_config, the Anker sheet as DataFrame or as its values.
+        The frame is reused, not made again.'''
+        model = copy.copy(self)
+        model.anchor_config = anchor_config
+        for key, value in self.frame_state.items():
+            setattr(model, key, copy.copy(value))
+        model.make_anchor_lines()
+        model.make_arrays()
+        return model
+
+    def make_arrays(self):
+        self.node_ids = np.array(self.node_ids, dtype=np.int64)
+        self.node_pos = np.array(self.node_pos, dtype=np.float64).reshape(-1, 3)
+        self.node_dof = np.array(self.node_dof, dtype=bool)
+        self.edge_ids = np.array(self.edge_ids, dtype=np.int64)
+        self.edge_nodes = np.array(self.edge_nodes, dtype=np.int64).reshape(-1, 2)
+
+    def add_node(self, name, pos, dof):
+        '''Add node, or replace the node with the same name.'''
+        row = self.node_index.setdefault(name, len(self.node_names))
+        if row == len(self.node_names):
+            self.node_names.append(name)
+            self.node_ids.append(self.node_id)
+            self.node_pos.append(pos)
+            self.node_dof.append(dof)
+        else:
+            self.node_ids[row] = self.node_id
+            self.node_pos[row] = pos
+            self.node_dof[row] = dof
+        self.node_id += 1
+
+    def add_edge(self, name, edge_id, edge=None):
+        '''Add edge between node names edge, or replace the edge with
+        the same name.'''
+        if edge is None:
+            rows = (-1, -1)
+        else:
+            rows = (self.node_index[edge[0]], self.node_index[edge[1]])
+        row = self.edge_index.setdefault(name, len(self.edge_names))
+        if row == len(self.edge_names):
+            self.edge_names.append(name)
+            self.edge_ids.append(edge_id)
+            self.edge_nodes.append(rows)
+        else:
+            self.edge_ids[row] = edge_id
+            self.edge_nodes[row] = rows
+
+    @property
+    def nodes(self):
+        '''Nodes as dictionary of name ==> pos, id and dof.'''
+        return {
+            name: {"pos": tuple(pos), "id": node_id, "dof": dof}
+            for name, node_id, pos, dof in zip(
+                self.node_names, self.node_ids.tolist(),
+                self.node_pos.tolist(), self.node_dof.tolist()
+            )
+        }
+
+    @property
+    def edges(self):
+        '''Edges as dictionary of name ==> edge_id, and edge as node
+        names for edges with nodes.'''
+        edges = {}
+        for name, edge_id, rows in zip(self.edge_names,
+                                       self.edge_ids.tolist(),
+                                       self.edge_nodes.tolist()):
+            edges[name] = {"edge_id": edge_id}
+            if rows[0] >= 0:
+                edges[name]["edge"] = (self.node_names[rows[0]],
+                                       self.node_names[rows[1]])
+        return edges
 
     def make_anchor_lines(self):
         categories = ["_Toppkjetting", "_Tau", "_Bunnkjetting"]
-        for row in self.anchor_config.iterrows():
-            anchor_num = row[1][0]
-            corner_num = row[1][1]
-            horizontal_length = float(row[1][2])
-            bottom_length = float(row[1][6])
-            top_length = float(row[1][7])
-            degree = float(row[1][3])
-            depth = float(row[1][4])
+        # Rows as values, with the types iterrows would give
+        for row in np.asarray(self.anchor_config):
+            anchor_num = row[0]
+            corner_num = row[1]
+            horizontal_length = float(row[2])
+            bottom_length = float(row[6])
+            top_length = float(row[7])
+            degree = float(row[3])
+            depth = float(row[4])
             rel_depth = depth - self.frame_depth
             tot_length = (horizontal_length**2 + rel_depth**2) ** 0.5
             mid_length = tot_length - bottom_length 
@@ -54,6 +162,7 @@ class Config:
             cos_elv = horizontal_length / tot_length # cos(elevation angle)
             lengths = [top_length, mid_length, tot_length]
             node_names = [corner_num]
+            corner = self.node_pos[self.node_index[corner_num]]
             for length in lengths:
                 node_name = round(
                     anchor_num + (tot_length - length) / 1e3, 3
@@ -62,23 +171,19 @@ class Config:
                 x, y = cartesian(
                     length * cos_elv,
                     degree,
-                    self.nodes[corner_num]["pos"][0],
-                    self.nodes[corner_num]["pos"][1]
+                    corner[0],
+                    corner[1]
                 )
                 z = -length * rel_depth / tot_length - self.frame_depth
-                self.nodes[node_name] = {
-                    "pos": (x, y, z),
-                    "id": self.node_id,
-                    "dof": (length != tot_length)
-                }
-                self.node_id += 1
+                self.add_node(node_name, (x, y, z), length != tot_length)
             # Set edges
             for i, category in enumerate(categories):
                 # .split()-hack to avoid annoying floating points
-                self.edges[str(anchor_num).split(".")[0]+category]= {
-                    "edge": (node_names[i], node_names[i+1]),
-                    "edge_id": self.edge_id + i * len(self.anchor_config)
-                }
+                self.add_edge(
+                    str(anchor_num).split(".")[0]+category,
+                    self.edge_id + i * len(self.anchor_config),
+                    (node_names[i], node_names[i+1])
+                )
             self.edge_id += 1
         self.edge_id += len(self.anchor_config) * (len(categories) - 1)
 
@@ -89,13 +194,8 @@ class Config:
         for x in allowed_x:
             for y in allowed_y:
                 x_rot, y_rot = rotate(x, y, self.course)
-                self.nodes[name] = {
-                    "pos": (x_rot, y_rot, -self.frame_depth),
-                    "id": self.node_id,
-                    "dof": True
-                }
+                self.add_node(name, (x_rot, y_rot, -self.frame_depth), True)
                 name += 1
-                self.node_id += 1
 
     def make_hane_edges(self):
         if self.num_rows > 2:
@@ -103,7 +203,7 @@ class Config:
         else:
             num_cages = self.num_cages
         for i in range(num_cages):
-            self.edges[chr(65+i)+"_Hanefot"] = {"edge_id": self.edge_id}
+            self.add_edge(chr(65+i)+"_Hanefot", self.edge_id)
             self.edge_id += 1
         
     def make_slings_edges(self):
@@ -112,7 +212,7 @@ class Config:
         else:
             num_cages = self.num_cages
         for i in range(num_cages):
-            self.edges[chr(65+i)+"_Slings"] = {"edge_id": self.edge_id}
+            self.add_edge(chr(65+i)+"_Slings", self.edge_id)
             self.edge_id += 1
 
     def make_frame_egdes(self):
@@ -123,10 +223,7 @@ class Config:
         node = 301
         for _ in range(nodes_per_row):
             for _ in range(self.num_rows):
-                self.edges[str(name)+"_Ramme"] = {
-                    "edge": (node, node+1),
-                    "edge_id": self.edge_id
-                }
+                self.add_edge(str(name)+"_Ramme", self.edge_id, (node, node+1))
                 name += 1
                 node += 1
                 self.edge_id += 1
@@ -137,10 +234,9 @@ class Config:
         node = 301
         for _ in range(self.num_cols):
             for _ in range(nodes_per_col):
-                self.edges[str(name)+"_Ramme"] = {
-                    "edge": (node, node+nodes_per_col),
-                    "edge_id": self.edge_id
-                }
+                self.add_edge(
+                    str(name)+"_Ramme", self.edge_id, (node, node+nodes_per_col)
+                )
                 name += 1
                 node += 1
                 self.edge_id += 1
@@ -1,113 +1,155 @@
 import sys
 from random import random
+from functools import lru_cache
 import xml.etree.ElementTree as et
 from Config import *
 
+MARK = "\0"  # Where nodes and components go in the serialized template
+DOF_FREE = {
+    "TranslationX": "true",
+    "TranslationY": "true",
+    "TranslationZ": "true",
+    "rotationX": "true",
+    "rotationY": "true",
+    "rotationZ": "true"
+}
+DOF_FIXED = {
+    "TranslationX": "false",
+    "TranslationY": "false",
+    "TranslationZ": "false",
+    "rotationX": "true",
+    "rotationY": "true",
+    "rotationZ": "true"
+}
+MOORING_DATA = {
+    "addedmasscoefflocaly":"0.0",
+    "addedmasscoefflocalz":"0.0",
+    "areal":"0.0",
+    "massdensity":"0.0",
+    "noCompressionForces":"false",
+    "pretension":"0.0",
+    "weightInAir":"0.0",
+    "young":"0.0"
+}
+EXTRA_DATA = {
+    "breakingload":"0.0",
+    "materialcoefficient":"0.0",
+    "trusstype":"3",
+    "weighttoaimfor":"0.0"
+}
+LOADMODEL_DATA = {
+    "LoadType":"MORRISON",
+    "closeSurfaceNumPoints":"0",
+    "constructionDamping":"0.0",
+    "currentreduction":"0.0",
+    "dragArealy":"0.0",
+    "dragArealyz":"0.0",
+    "dragCoeffy":"1.2",
+    "dragCoeffz":"1.2",
+    "hullnumPoints":"0",
+    "massRadius":"0.0",
+    "numWaveHeading":"0",
+    "numvelocities":"0",
+    "rayleighStiffness":"0.0",
+    "tangentialDragCoefficient":"0.0",
+    "viscousRollDamping":"1.0",
+    "wavereduction":"0.0"
+}
+DESCRIPTION_DATA = {"active": "true", "des": ""}
+
+
+def escape(text):
+    '''Escape text for an attribute value, as ElementTree does.'''
+    return (
+        text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        .replace("\"", "&quot;").replace("\r", "&#13;")
+        .replace("\n", "&#10;").replace("\t", "&#09;")
+    )
+
+
+def element(tag, data):
+    '''Serialized empty element with attributes data.'''
+    return et.tostring(et.Element(tag, data), encoding="unicode")
+
+
+@lru_cache(maxsize=4)
+def split_template(template_path):
+    '''Serialized template, split where the nodes and the components
+    go. They follow any nodes and components of the template.'''
+    root = et.parse(template_path).getroot()
+    for parent in (root[0], root[2]):
+        if len(parent):
+            parent[-1].tail = (parent[-1].tail or "") + MARK
+        else:
+            parent.text = (parent.text or "") + MARK
+    return tuple(et.tostring(root, encoding="unicode").split(MARK))
+
 
 class Renderer:
+    '''Writes the model XML of amodel into the template. Nodes and trusses
+    are streamed as text into the serialized template, so no element
+    tree is built for them.'''
 
     def __init__(self, amodel, template_path):
         self.template_path = template_path
         self.amodel = amodel
-        self.tree = et.parse(template_path)
-        self.set_nodes()
-        self.set_components()
-
-    def set_nodes(self):
-        root = self.tree.getroot()
-        nodes = root[0]
-        
-        for name, vals in self.amodel.nodes.items():
-            data = {
-                "id": str(vals["id"]),
-                "tagname": str(name),
-                "x": str(vals["pos"][0]),
-                "y": str(vals["pos"][1]),
-                "z": str(vals["pos"][2])
-            }
-            if vals["dof"]:
-                dof = {
-                    "TranslationX": "true",
-                    "TranslationY": "true",
-                    "TranslationZ": "true",
-                    "rotationX": "true",
-                    "rotationY": "true",
-                    "rotationZ": "true"
-                }
-            else:
-                dof = {
-                    "TranslationX": "false",
-                    "TranslationY": "false",
-                    "TranslationZ": "false",
-                    "rotationX": "true",
-                    "rotationY": "true",
-                    "rotationZ": "true"
-                }
-            node = et.SubElement(nodes, "node", data)
-            et.SubElement(node, "dof6", dof)
-    
-    def set_components(self):
-        root = self.tree.getroot()
-        components = root[2]
-        mooring_data = {
-            "addedmasscoefflocaly":"0.0",
-            "addedmasscoefflocalz":"0.0",
-            "areal":"0.0",
-            "massdensity":"0.0",
-            "noCompressionForces":"false",
-            "pretension":"0.0",
-            "weightInAir":"0.0",
-            "young":"0.0"
-        }
-        extra_data = {
-            "breakingload":"0.0",
-            "materialcoefficient":"0.0",
-            "trusstype":"3",
-            "weighttoaimfor":"0.0"
-        }
-        loadmodel_data = {
-            "LoadType":"MORRISON",
-            "closeSurfaceNumPoints":"0",
-            "constructionDamping":"0.0",
-            "currentreduction":"0.0",
-            "dragArealy":"0.0",
-            "dragArealyz":"0.0",
-            "dragCoeffy":"1.2",
-            "dragCoeffz":"1.2",
-            "hullnumPoints":"0",
-            "massRadius":"0.0",
-            "numWaveHeading":"0",
-            "numvelocities":"0",
-            "rayleighStiffness":"0.0",
-            "tangentialDragCoefficient":"0.0",
-            "viscousRollDamping":"1.0",
-            "wavereduction":"0.0"
-        }
-        description_data = {"active": "true", "des": ""}
-        for name, vals in self.amodel.edges.items():
-            truss_data = {"id": str(vals["edge_id"]), "name": str(name)}
-            color_data = {
-                "blue": str(random()),
-                "green": str(random()),
-                "red": str(random())
-            }
-            truss = et.SubElement(components, "truss", truss_data)
-            et.SubElement(truss, "mooring", mooring_data)
-            et.SubElement(truss, "extra", extra_data)
-            et.SubElement(truss, "loadmodel", loadmodel_data)
-            description = et.SubElement(truss, "description", description_data)
-            et.SubElement(description, "color", color_data)
-            if "edge" in vals:
-                element_data = {
-                    "id": str(vals["edge_id"]),
-                    "StartNode_ID": str(self.amodel.nodes[vals["edge"][1]]["id"]),
-                    "EndNode_ID": str(self.amodel.nodes[vals["edge"][0]]["id"])
-                }
-                elements = et.SubElement(truss, "elements")
-                et.SubElement(elements, "element", element_data)
-    
+        self.head, self.middle, self.tail = split_template(template_path)
+        # Drawn here, as when the trusses were made on construction
+        self.colors = [
+            (random(), random(), random()) for _ in amodel.edge_names
+        ]
+
+    def iter_nodes(self):
+        '''Serialized node elements.'''
+        amodel = self.amodel
+        dof = {True: element("dof6", DOF_FREE), False: element("dof6", DOF_FIXED)}
+        pos = amodel.node_pos.tolist()
+        # Frame depth as read, so integer depths are written as before
+        frame_z = str(-amodel.frame_depth)
+        for row, (name, node_id, free) in enumerate(zip(
+                amodel.node_names, amodel.node_ids.tolist(),
+                amodel.node_dof.tolist())):
+            x, y, z = pos[row]
+            z = frame_z if row < amodel.num_nodes else str(z)
+            yield (
+                f'<node id="{node_id}" tagname="{escape(str(name))}" '
+                f'x="{x}" y="{y}" z="{z}">{dof[free]}</node>'
+            )
+
+    def iter_components(self):
+        '''Serialized truss elements.'''
+        amodel = self.amodel
+        data = (
+            element("mooring", MOORING_DATA)
+            + element("extra", EXTRA_DATA)
+            + element("loadmodel", LOADMODEL_DATA)
+        )
+        description = element("description", DESCRIPTION_DATA)[:-3] + ">"
+        node_ids = amodel.node_ids.tolist()
+        for name, edge_id, rows, (blue, green, red) in zip(
+                amodel.edge_names, amodel.edge_ids.tolist(),
+                amodel.edge_nodes.tolist(), self.colors):
+            truss = (
+                f'<truss id="{edge_id}" name="{escape(str(name))}">{data}'
+                f'{description}<color blue="{blue}" green="{green}" '
+                f'red="{red}" /></description>'
+            )
+            if rows[0] >= 0:
+                truss += (
+                    f'<elements><element id="{edge_id}" '
+                    f'StartNode_ID="{node_ids[rows[1]]}" '
+                    f'EndNode_ID="{node_ids[rows[0]]}" /></elements>'
+                )
+            yield truss + "</truss>"
+
     def write(self, path):
-        self.tree.write(path)
+        with open(path, "w", encoding="us-ascii",
+                  errors="xmlcharrefreplace") as file:
+            file.write(self.head)
+            file.writelines(self.iter_nodes())
+            file.write(self.middle)
+            file.writelines(self.iter_components())
+            file.write(self.tail)
 
 
 def main():
@@ -120,4 +162,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
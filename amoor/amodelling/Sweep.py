@@ -0,0 +1,183 @@
+"""
+Parametric sweep of an amodelling config.
+
+Every combination of the swept parameters is one variant, written as its
+own model XML. Variants with the same course share one frame, made once
+and reused for all of their anchor lines. Variants are rendered in
+worker processes, and a manifest maps each variant to its parameters and
+file.
+
+Usage, from the repository root:
+    python amoor/amodelling/Sweep.py config.xlsx out_dir \\
+        --horizontal-length 200:400:25 --depth 60,80 --jobs 8
+"""
+import os
+import json
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from Config import Config
+from Renderer import Renderer
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "model_template.xml")
+MANIFEST_FILE = "sweep.json"
+# Columns of the Anker sheet, by parameter name
+ANCHOR_COLUMNS = {
+    "horizontal_length": 2,
+    "depth": 4,
+    "bottom_length": 6,
+    "top_length": 7
+}
+COURSE_ROW = 5  # Row of the Ramme sheet
+PARAMETERS = list(ANCHOR_COLUMNS) + ["course"]
+
+_frames = {}  # Frame model of each course, set in each worker
+
+
+def variants(parameters):
+    '''All combinations of parameters, a dictionary of name ==> values,
+    as dictionaries of name ==> value. The last name varies fastest.'''
+    names = list(parameters)
+    return [dict(zip(names, values))
+            for values in itertools.product(*parameters.values())]
+
+
+def frame_config(base, course=None):
+    '''Copy of Ramme sheet base, with course if it is given.'''
+    config = base.copy()
+    if course is not None:
+        # Only the course cell is set, so the other values keep their type
+        # and are written as in a model of the sheet itself
+        config.isetitem(1, config.iloc[:, 1].astype(object))
+        config.iloc[COURSE_ROW, 1] = course
+    return config
+
+
+def anchor_values(base, variant, rows=None):
+    '''Copy of base, the values of an Anker sheet, with the anchor
+    parameters of variant in rows, or in all rows. The values are
+    promoted as in DataFrame.values, so they are the values of the sheet
+    with the parameters filled in.'''
+    values = base.copy()
+    if rows is None:
+        rows = slice(None)
+    for name, column in ANCHOR_COLUMNS.items():
+        if name in variant:
+            values = values.astype(np.result_type(values, variant[name]),
+                                   copy=False)
+            values[rows, column] = variant[name]
+    return values
+
+
+def _init_worker(frames):
+    _frames.update(frames)
+
+
+def _render(task):
+    '''Write the model XML of each (number, variant, path) of variants,
+    which all have the same course. Colors are seeded by the variant
+    number, so a sweep gives the same files every time.'''
+    course, variants, template_path, anchors = task
+    frame = _frames[course]
+    base = np.asarray(frame.anchor_config)
+    rows = None
+    if anchors is not None:
+        rows = np.isin(base[:, 0], anchors)
+    for number, variant, path in variants:
+        model = frame.with_anchors(anchor_values(base, variant, rows))
+        random.seed(number)
+        Renderer(model, template_path).write(path)
+    return len(variants)
+
+
+def sweep(config_path, out_dir, parameters, anchors=None, jobs=1,
+          template_path=TEMPLATE_PATH):
+    '''Write the model XML of every variant of the config at config_path
+    to out_dir, with a manifest. parameters is a dictionary of
+    name ==> values, names from PARAMETERS. Anchor parameters are set for
+    the anchors numbered in anchors, or for all anchors.
+    Returns the manifest entries, one per variant with its number,
+    parameters and file name.'''
+    unknown = set(parameters) - set(PARAMETERS)
+    if unknown:
+        raise ValueError("Unknown sweep parameters {}, use {}".format(
+            sorted(unknown), PARAMETERS))
+    parameters = {name: np.asarray(values).tolist()
+                  for name, values in parameters.items()}
+    sheets = pd.read_excel(config_path, sheet_name=["Ramme", "Anker"])
+    frames = {
+        course: Config(frame_config=frame_config(sheets["Ramme"], course),
+                       anchor_config=sheets["Anker"])
+        for course in parameters.get("course", [None])
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    entries = [
+        {"variant": number, "parameters": variant,
+         "file": "variant{:05d}.xml".format(number)}
+        for number, variant in enumerate(variants(parameters), 1)
+    ]
+    # Chunks of variants with the same course, a few per worker
+    chunk_size = max(1, len(entries) // (4 * jobs))
+    tasks = []
+    for course in frames:
+        group = [(entry["variant"], entry["parameters"],
+                  os.path.join(out_dir, entry["file"]))
+                 for entry in entries
+                 if entry["parameters"].get("course") == course]
+        for start in range(0, len(group), chunk_size):
+            tasks.append((course, group[start:start+chunk_size],
+                          template_path, anchors))
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(frames,)) as executor:
+            list(executor.map(_render, tasks))
+    else:
+        _init_worker(frames)
+        list(map(_render, tasks))
+    manifest = {
+        "config": str(config_path),
+        "template": str(template_path),
+        "anchors": anchors,
+        "variants": entries
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=1)
+    return entries
+
+
+def parse_values(text):
+    '''Values of "start:stop:step", with stop included, or of
+    comma separated "a,b,c".'''
+    if ":" in text:
+        start, stop, step = (float(value) for value in text.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(value) for value in text.split(",")])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write model XML for every combination of the "
+                    "swept parameters of an Excel config.")
+    parser.add_argument("config_path")
+    parser.add_argument("out_dir")
+    for name in PARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), type=parse_values,
+                            help="start:stop:step or a,b,c")
+    parser.add_argument("--anchors", type=parse_values,
+                        help="Anchor numbers to vary, all by default")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes")
+    args = parser.parse_args()
+    parameters = {name: getattr(args, name) for name in PARAMETERS
+                  if getattr(args, name) is not None}
+    anchors = None if args.anchors is None else args.anchors.tolist()
+    entries = sweep(args.config_path, args.out_dir, parameters, anchors,
+                    args.jobs)
+    print("Wrote {} variants to {}".format(len(entries), args.out_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import random
+import numpy as np
+import pandas as pd
+import Sweep
+from Config import Config
+from Renderer import Renderer
+
+
+def _write_config(path, course=30, depth=None):
+    '''Small config with integer frame values, as typed into the sheet.'''
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "Parameter": ["rader", "kolonner", "lengde", "bredde", "dybde",
+                      "kurs"],
+        "Verdi": [1, 2, 80, 60, 10, course]})
+    anchors = pd.DataFrame({
+        "Anker": [1, 2, 3],
+        "Hjorne": [301, 303, 306],
+        "Horisontal": rng.uniform(200, 400, 3).round(1),
+        "Retning": rng.uniform(0, 360, 3).round(1),
+        "Dybde": rng.uniform(40, 120, 3).round(1),
+        "Kommentar": ["x"] * 3,
+        "Bunn": rng.uniform(20, 40, 3).round(1),
+        "Topp": rng.uniform(5, 15, 3).round(1)})
+    if depth is not None:
+        anchors["Dybde"] = depth
+    with pd.ExcelWriter(path) as writer:
+        frame.to_excel(writer, sheet_name="Ramme", index=False)
+        anchors.to_excel(writer, sheet_name="Anker", index=False)
+
+
+def _render(config_path, path, number):
+    random.seed(number)
+    Renderer(Config(config_path), Sweep.TEMPLATE_PATH).write(path)
+
+
+def test_frame_config_keeps_other_values():
+    base = pd.DataFrame({"Parameter": list("abcdef"),
+                         "Verdi": [1, 2, 80, 60, 10, 30]})
+    config = Sweep.frame_config(base, 45.5)
+    assert config.iloc[4, 1] == 10 and isinstance(config.iloc[4, 1], int)
+    assert config.iloc[5, 1] == 45.5
+    assert base.iloc[5, 1] == 30
+
+
+def test_sweep_variant_matches_direct_render(tmp_path):
+    _write_config(tmp_path / "base.xlsx")
+    _write_config(tmp_path / "course.xlsx", course=45)
+    entries = Sweep.sweep(tmp_path / "base.xlsx", tmp_path / "sweep",
+                          {"course": Sweep.parse_values("30,45")})
+    for entry, name in zip(entries, ["base.xlsx", "course.xlsx"]):
+        _render(tmp_path / name, tmp_path / "direct.xml", entry["variant"])
+        direct = (tmp_path / "direct.xml").read_text()
+        assert (tmp_path / "sweep" / entry["file"]).read_text() == direct
+    assert 'z="-10"' in direct
+
+
+def test_sweep_anchor_variant_matches_direct_render(tmp_path):
+    _write_config(tmp_path / "base.xlsx")
+    _write_config(tmp_path / "depth.xlsx", depth=80.5)
+    entries = Sweep.sweep(tmp_path / "base.xlsx", tmp_path / "sweep",
+                          {"depth": [80.5]}, jobs=2)
+    _render(tmp_path / "depth.xlsx", tmp_path / "direct.xml", 1)
+    assert ((tmp_path / "sweep" / entries[0]["file"]).read_text()
+            == (tmp_path / "direct.xml").read_text())
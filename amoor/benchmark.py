@@ -0,0 +1,257 @@
+"""
+Benchmarks of the result pipeline on synthetic inputs.
+
+Suite writes .avz-, key.txt- and Olex files with amoor.synthetic, and
+runs each stage of the pipeline on them in order: avz_to_df, key_to_df,
+merge, summarize, Excel output with both writers, and make_buildup_form.
+A stage is timed as the best of a few runs, and its peak memory is taken
+with tracemalloc in one more run. Memoized results are cleared before
+every run, so each run does the whole work. Memory held by pyarrow is
+not seen by tracemalloc.
+
+Results are compared with the baseline stored in BASELINE_PATH, made with
+the same sizes, and stages that got slower or use more memory than the
+tolerances allow are reported as regressions. Timings depend on the
+machine, so store a new baseline before comparing on another one.
+
+Usage, from the repository root:
+    python -m amoor.benchmark           # Compare with baseline
+    python -m amoor.benchmark --save    # Store results as baseline
+"""
+import sys
+import json
+import time
+import zipfile
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from pathlib import Path
+from amoor import read_avz, read_key, merge, max_summary, workbook, synthetic
+from amoor import model_xml
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+SIZES = {
+    'num_loads': 4,          # Load cases, .avz- and key.txt-files
+    'num_components': 2000,
+    'num_elements': 4,       # Elements of each component
+    'num_timesteps': 20,
+    'num_olex_lines': 2000
+}
+TIME_TOLERANCE = 0.25    # Relative increase counted as regression
+MEMORY_TOLERANCE = 0.10
+
+
+class Suite:
+    '''Synthetic inputs in folder, and the stages of the pipeline that
+    run on them. Each stage reads what the stages before it wrote.'''
+
+    def __init__(self, folder, sizes=SIZES):
+        self.folder = Path(folder)
+        self.sizes = dict(sizes)
+        num_components = self.sizes['num_components']
+        self.avz_paths = []
+        self.key_paths = []
+        for lt in range(1, self.sizes['num_loads'] + 1):
+            avz_path = self.folder / 'Site{:03d}PFAT.avz'.format(lt)
+            key_path = self.folder / 'Site{:03d}key.txt'.format(lt)
+            synthetic.write_avz(avz_path, num_components,
+                                self.sizes['num_elements'],
+                                self.sizes['num_timesteps'], seed=lt)
+            synthetic.write_key(key_path, num_components)
+            self.avz_paths.append(avz_path)
+            self.key_paths.append(key_path)
+        self.olex_path = self.folder / 'olex.gz'
+        synthetic.write_olex(self.olex_path, self.sizes['num_olex_lines'],
+                             dirty=True)
+        self.pfat_paths = [path.with_suffix('.feather')
+                           for path in self.avz_paths]
+        self.key_result_paths = [path.with_suffix('.feather')
+                                 for path in self.key_paths]
+        self.merged_paths = [self.folder / 'Site{:03d}merged.feather'.format(lt)
+                             for lt in range(1, len(self.avz_paths) + 1)]
+        self.summary = None
+
+    def reset(self):
+        '''Clear memoized results, of model.xml parses and geodesics.'''
+        model_xml._read_cached.cache_clear()
+        if 'amoor.olutil' in sys.modules:
+            olutil = sys.modules['amoor.olutil']
+            olutil._inverse.cache_clear()
+            olutil._direct.cache_clear()
+
+    def stages(self):
+        '''Stages in order, as (name, function, amount of work, unit).'''
+        avs_megabytes = sum(
+            zipfile.ZipFile(path).getinfo('model.avs').file_size
+            for path in self.avz_paths) / 1e6
+        key_megabytes = sum(path.stat().st_size
+                            for path in self.key_paths) / 1e6
+        rows = self.sizes['num_components'] * len(self.avz_paths)
+        return [
+            ('avz_to_df', self.avz_to_df, avs_megabytes, 'MB'),
+            ('key_to_df', self.key_to_df, key_megabytes, 'MB'),
+            ('merge', self.merge, rows, 'rows'),
+            ('summarize', self.summarize, rows, 'rows'),
+            ('excel', self.excel, self.sizes['num_components'], 'rows'),
+            ('excel_fast', self.excel_fast, self.sizes['num_components'],
+             'rows'),
+            ('make_buildup_form', self.make_buildup_form,
+             self.sizes['num_olex_lines'], 'lines')
+        ]
+
+    def avz_to_df(self):
+        for avz_path, pfat_path in zip(self.avz_paths, self.pfat_paths):
+            df = read_avz.avz_to_df(str(avz_path), False, True)
+            merge.write_result(df, pfat_path)
+
+    def key_to_df(self):
+        for key_path, result_path in zip(self.key_paths,
+                                         self.key_result_paths):
+            merge.write_result(read_key.key_to_df(str(key_path)),
+                               result_path)
+
+    def merge(self):
+        for pfat_path, key_path, merged_path in zip(
+                self.pfat_paths, self.key_result_paths, self.merged_paths):
+            merge.merge(pfat_path, key_path, merged_path)
+
+    def summarize(self):
+        self.summary = max_summary.summarize(self.merged_paths)
+
+    def _sheets(self):
+        '''The biggest sheets of a max summary workbook.'''
+        result = max_summary.reorder_to_store_order(self.summary)
+        return {
+            'result': result,
+            'utilization': max_summary.prioritize_components(
+                result, 'utilization', 10),
+            'buildup': max_summary.pivot_config(
+                result, ['Bunnkjetting', 'Tau', 'Toppkjetting'],
+                ['material', 'length', 'utilization'])
+        }
+
+    def excel(self):
+        workbook.write_workbook(self.folder / 'summary.xlsx', self._sheets())
+
+    def excel_fast(self):
+        workbook.write_workbook(self.folder / 'summary_fast.xlsx',
+                                self._sheets(), fast=True)
+
+    def make_buildup_form(self):
+        # olutil needs folium, which the rest of the pipeline does not
+        from amoor import olutil
+        olutil.make_buildup_form(self.olex_path)
+
+
+def measure(function, repeat=3, reset=None):
+    '''Best time [s] of repeat runs of function, and its peak memory
+    [MB] in one more run. reset is called before every run.'''
+    seconds = float('inf')
+    for _ in range(repeat):
+        if reset:
+            reset()
+        tic = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - tic)
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def run(sizes=SIZES, repeat=3):
+    '''Run all stages on synthetic inputs of sizes. Returns dictionary
+    with sizes, machine and results, a dictionary of stage name ==>
+    seconds, peak_mb, throughput and unit, where throughput is the
+    amount of work per second.'''
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        suite = Suite(folder, sizes)
+        for name, function, amount, unit in suite.stages():
+            seconds, peak_mb = measure(function, repeat, suite.reset)
+            results[name] = {'seconds': round(seconds, 4),
+                             'peak_mb': round(peak_mb, 2),
+                             'throughput': round(amount / seconds, 2),
+                             'unit': unit + '/s'}
+    return {'sizes': dict(sizes), 'machine': platform.platform(),
+            'python': platform.python_version(), 'results': results}
+
+
+def regressions(run_result, baseline, time_tolerance=TIME_TOLERANCE,
+                memory_tolerance=MEMORY_TOLERANCE):
+    '''Stages of run_result that are slower or use more memory than in
+    baseline, beyond the tolerances. Returns list of messages.'''
+    messages = []
+    for name, result in run_result['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if result['seconds'] > base['seconds'] * (1 + time_tolerance):
+            messages.append('{}: {:.3f} s, baseline {:.3f} s'.format(
+                name, result['seconds'], base['seconds']))
+        if result['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance):
+            messages.append('{}: {:.1f} MB, baseline {:.1f} MB'.format(
+                name, result['peak_mb'], base['peak_mb']))
+    return messages
+
+
+def _report(run_result, baseline=None):
+    '''Print table of run_result, with change from baseline.'''
+    print('{:<18} {:>9} {:>9} {:>13} {:>8}'.format(
+        'stage', 'seconds', 'peak MB', 'throughput', 'change'))
+    for name, result in run_result['results'].items():
+        change = ''
+        if baseline and name in baseline['results']:
+            base = baseline['results'][name]['seconds']
+            change = '{:+.0%}'.format(result['seconds'] / base - 1)
+        print('{:<18} {:>9.3f} {:>9.1f} {:>13} {:>8}'.format(
+            name, result['seconds'], result['peak_mb'],
+            '{:.1f} {}'.format(result['throughput'], result['unit']),
+            change))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the result pipeline on synthetic inputs.')
+    parser.add_argument('--save', action='store_true',
+                        help='Store results as baseline')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed runs of each stage')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    for name, size in SIZES.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=int,
+                            default=size)
+    args = parser.parse_args()
+    sizes = {name: getattr(args, name) for name in SIZES}
+    run_result = run(sizes, args.repeat)
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump(run_result, file, indent=1)
+        _report(run_result)
+        print('Baseline stored in {}'.format(args.baseline))
+        return 0
+    baseline = None
+    if args.baseline.exists():
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['sizes'] != sizes:
+            print('Baseline has other sizes, {}, not compared.'.format(
+                baseline['sizes']))
+            baseline = None
+    _report(run_result, baseline)
+    if baseline is None:
+        return 0
+    messages = regressions(run_result, baseline)
+    for message in messages:
+        print('Regression in ' + message)
+    return 1 if messages else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
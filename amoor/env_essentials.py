@@ -18,10 +18,10 @@ def get_corr_vals(df, target, corr_vals):
     max_val = df[target].max()
     idx = (df[target] == max_val)
     sektor = df.loc[idx, "sektor"].unique().tolist()
-    strom5retn = df.loc[idx, "strom5retn"].apply(
-        lambda r: direction((r+180)%360, False)).unique().tolist()
-    strom15retn = df.loc[idx, "strom15retn"].apply(
-        lambda r: direction((r+180)%360, False)).unique().tolist()
+    strom5retn = pd.unique(sectors(
+        (df.loc[idx, "strom5retn"]+180)%360, numeric=False)).tolist()
+    strom15retn = pd.unique(sectors(
+        (df.loc[idx, "strom15retn"]+180)%360, numeric=False)).tolist()
 
     corr_vals[target]["max_val"] = max_val
     corr_vals[target]["sektor"] = "; ".join(sektor)
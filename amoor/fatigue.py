@@ -0,0 +1,136 @@
+"""
+Fatigue damage and life of every element, by Miner summation on an S-N
+curve.
+
+Stress ranges come either from histories, (element x time) arrays such as
+the force histories of force_history, which are rainflow counted, or from
+the Right_web stress ranges of merged results, with a number of cycles
+per year for each load case. All elements are handled together with array
+operations. handler.py uses the Right_web damage; the force histories
+are in N and have no section to give stresses, so rainflow_damage is
+left to callers that know the scale.
+"""
+import re
+import numpy as np
+import pandas as pd
+from amoor.merge import read_result
+
+# DNV-RP-C203, curve D in air. Stress ranges in MPa.
+SN_CURVE_D = {'m1': 3.0, 'log_a1': 12.164, 'm2': 5.0, 'log_a2': 15.606,
+              'knee_cycles': 1e7}
+
+
+def cycle_damage(ranges, curve=SN_CURVE_D):
+    '''Miner damage of one cycle of each stress range, 1/N.
+    Curves with m2 set to None have a single slope.'''
+    ranges = np.abs(np.asarray(ranges, dtype=np.float64))
+    damage = ranges ** curve['m1'] / 10 ** curve['log_a1']
+    if curve.get('m2') is not None:
+        knee_range = (10 ** curve['log_a1'] / curve['knee_cycles']) ** (1 / curve['m1'])
+        low = ranges < knee_range
+        damage[low] = ranges[low] ** curve['m2'] / 10 ** curve['log_a2']
+    return damage
+
+
+def rainflow_damage(histories, curve=SN_CURVE_D, scale=1.0, chunk=4096):
+    '''Miner damage of each row of histories, (element x time), from
+    rainflow counted ranges (ASTM E1049, three point method). Values are
+    multiplied by scale, a number or one per element, to give stress in
+    the unit of curve. NaN values are skipped. Rows are counted together,
+    chunk elements at a time, so memory-mapped histories are fine.'''
+    histories = np.atleast_2d(histories)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64),
+                            (len(histories),))
+    damage = np.zeros(len(histories))
+    for start in range(0, len(histories), chunk):
+        values = (np.asarray(histories[start:start+chunk], dtype=np.float64)
+                  * scale[start:start+chunk, None])
+        damage[start:start+chunk] = _rainflow_chunk(values, curve)
+    return damage
+
+
+def _rainflow_chunk(values, curve):
+    '''Rainflow count rows of values in lockstep, one time step at a time.
+    Each row has its own stack of reversals from low to end.'''
+    num_rows, num_steps = values.shape
+    rows = np.arange(num_rows)
+    stack = np.zeros((num_rows, num_steps + 1))
+    low = np.zeros(num_rows, dtype=np.int64)
+    end = np.zeros(num_rows, dtype=np.int64)
+    damage = np.zeros(num_rows)
+    for step in range(num_steps):
+        value = values[:, step]
+        size = end - low
+        last = stack[rows, np.maximum(end - 1, 0)]
+        prev = stack[rows, np.maximum(end - 2, 0)]
+        is_flat = np.isnan(value) | ((size >= 1) & (value == last))
+        # Still going the same way, so the last point is no reversal
+        is_going = ~is_flat & (size >= 2) & ((value - last) * (last - prev) > 0)
+        is_new = ~is_flat & ~is_going
+        stack[rows[is_going], end[is_going] - 1] = value[is_going]
+        stack[rows[is_new], end[is_new]] = value[is_new]
+        end[is_new] += 1
+
+        active = rows[~is_flat]
+        while active.size:
+            active = active[end[active] - low[active] >= 3]
+            top = end[active]
+            x_range = np.abs(stack[active, top - 1] - stack[active, top - 2])
+            y_range = np.abs(stack[active, top - 2] - stack[active, top - 3])
+            is_counted = x_range >= y_range
+            active = active[is_counted]
+            top = top[is_counted]
+            y_range = y_range[is_counted]
+            # Y holding the starting point is a half cycle
+            is_half = top - 3 == low[active]
+            damage[active] += (np.where(is_half, 0.5, 1.0)
+                               * cycle_damage(y_range, curve))
+            low[active[is_half]] += 1
+            full = active[~is_half]
+            top = top[~is_half]
+            stack[full, top - 3] = stack[full, top - 1]
+            end[full] -= 2
+
+    # Remaining ranges are half cycles
+    columns = np.arange(num_steps)
+    is_residue = (columns >= low[:, None]) & (columns + 1 < end[:, None])
+    residue = np.where(is_residue, np.abs(np.diff(stack, axis=1)), 0)
+    damage += 0.5 * cycle_damage(residue, curve).sum(axis=1)
+    return damage
+
+
+def right_web_damage(result_paths, cycles, curve=SN_CURVE_D):
+    '''Damage per year of each element from the Right_web stress ranges
+    of the merged results in result_paths. cycles maps LT number to the
+    number of cycles per year of that load case; other load cases are
+    skipped. Returns Series indexed by id.'''
+    entry_pat = re.compile(r'(\d{1,3})merged\.(csv|feather)')
+    damage = None
+    for path in result_paths:
+        lt = int(entry_pat.search(str(path))[1])
+        if lt not in cycles:
+            continue
+        right_web = read_result(path)['right_web']
+        lt_damage = pd.Series(cycle_damage(right_web.to_numpy(), curve)
+                              * cycles[lt], index=right_web.index)
+        if damage is None:
+            damage = lt_damage
+        else:
+            damage = damage.add(lt_damage, fill_value=0)
+    if damage is None:
+        damage = pd.Series(dtype=np.float64)
+    damage.index.name = 'id'
+    return damage
+
+
+def fatigue_table(damage, result, n_components=10):
+    '''Table of the n_components elements with most damage per year, and
+    their estimated life in years. result is a summary with id column.
+    Elements missing from result get empty component columns.'''
+    table = result.set_index('id')[['component', 'segment', 'material',
+                                    'right_web']]
+    table = table.reindex(damage.index)
+    table['damage'] = damage
+    with np.errstate(divide='ignore'):
+        table['life'] = 1 / damage
+    return table.sort_values('damage', ascending=False).head(n_components)
@@ -0,0 +1,168 @@
+"""
+Axial force history of every element at every reported time step.
+
+HistoryWriter is fed by read_avz._read_avs while it walks the TIMESTEP
+blocks of model.avs, and writes a float32 (element x timestep) array to a
+.npy file, with element ids, step numbers and times in a .npz file next
+to it. Only one time step is held in memory. ForceHistory memory-maps the
+result and slices it by element id or time window.
+"""
+import os
+import sys
+import numpy as np
+from pathlib import Path
+from amoor import read_avz
+
+HISTORY_BLOCK = 'STRESS_LINE_LIST:Local_section_forces.Axial_force_[N] {'
+
+
+def history_path(out_path):
+    '''Path of force history belonging to output file at out_path.'''
+    out_path = Path(out_path)
+    return out_path.with_name(out_path.stem + '_force_history.npy')
+
+
+class HistoryWriter:
+    '''Collects the largest force of each element, one time step at a
+    time. Elements are columns in the order of the first time step;
+    elements missing from a later time step get NaN.'''
+
+    def __init__(self, path, block=HISTORY_BLOCK, chunk_bytes=1 << 26):
+        self.path = Path(path)
+        self.block = block.encode('Latin-1')
+        self.chunk_bytes = chunk_bytes
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.file = open(self.tmp_path, 'wb')
+        self.ids = []
+        self.columns = None
+        self.row = None
+        self.num_steps = 0
+        self.times = []
+
+    def timestep(self):
+        '''Start a new time step, with unknown time until time is called.'''
+        self._flush()
+        if self.columns is None:
+            self.row = []
+        else:
+            self.row = np.full(len(self.ids), np.nan, dtype=np.float32)
+        self.times.append(np.nan)
+
+    def time(self, value):
+        '''Set the time [s] of this time step.'''
+        if self.row is not None:
+            self.times[-1] = value
+
+    def add(self, element, values):
+        '''Add values of element, as given in its block, to this time step.'''
+        if self.row is None:
+            return  # Not inside a time step
+        value = values.max() if len(values) else np.nan
+        if self.columns is None:
+            self.ids.append(int(element))
+            self.row.append(value)
+        else:
+            column = self.columns.get(int(element))
+            if column is not None:
+                self.row[column] = value
+
+    def _flush(self):
+        '''Append the current time step to the temporary file.'''
+        if self.row is None:
+            return
+        if self.columns is None:
+            self.columns = {element: i for i, element in enumerate(self.ids)}
+        self.file.write(np.asarray(self.row, dtype=np.float32).tobytes())
+        self.num_steps += 1
+        self.row = None
+
+    def close(self):
+        '''Write the (element x timestep) array, transposed from the
+        temporary file in chunks of elements, and the ids, steps and
+        times. Both files are written under temporary names and moved into
+        place at the end, so a history at path is always complete.'''
+        self._flush()
+        self.file.close()
+        num_elements = len(self.ids)
+        part_path = self.path.with_name(self.path.stem + '.part.npy')
+        meta_part_path = self.path.with_name(self.path.stem + '.part.npz')
+        forces = np.lib.format.open_memmap(
+            part_path, mode='w+', dtype=np.float32,
+            shape=(num_elements, self.num_steps)
+        )
+        if num_elements and self.num_steps:
+            by_step = np.memmap(self.tmp_path, dtype=np.float32, mode='r',
+                                shape=(self.num_steps, num_elements))
+            chunk = max(1, self.chunk_bytes // (4 * self.num_steps))
+            for start in range(0, num_elements, chunk):
+                forces[start:start+chunk] = by_step[:, start:start+chunk].T
+            del by_step
+        forces.flush()
+        del forces
+        os.remove(self.tmp_path)
+        np.savez(meta_part_path,
+                 id=np.array(self.ids, dtype=np.int64),
+                 step=np.arange(self.num_steps),
+                 time=np.array(self.times, dtype=np.float64))
+        os.replace(meta_part_path, self.path.with_suffix('.npz'))
+        os.replace(part_path, self.path)
+
+    def abort(self):
+        '''Discard the time steps written so far, after a failed parse.
+        Nothing is written to path.'''
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+def extract(avz_path, out_path, block=HISTORY_BLOCK):
+    '''Write force history of .avz-file at avz_path to out_path.
+    Returns the history.'''
+    writer = HistoryWriter(out_path, block)
+    try:
+        read_avz._read_avs(avz_path, blocks=[], history=writer)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return ForceHistory(out_path)
+
+
+class ForceHistory:
+    '''Memory-mapped (element x timestep) force history. Windows are
+    given in time [s], as in the TIME lines of model.avs.'''
+
+    def __init__(self, path):
+        path = Path(path)
+        self.forces = np.load(path, mmap_mode='r')
+        meta = np.load(path.with_suffix('.npz'))
+        self.ids = meta['id']
+        self.steps = meta['step']
+        self.times = meta['time']
+        self.rows = {element: i for i, element in enumerate(self.ids)}
+
+    def element(self, element_id, start=None, stop=None):
+        '''Forces of element with element_id from time start to stop.'''
+        return self.forces[self.rows[element_id], self.window_slice(start, stop)]
+
+    def window(self, start=None, stop=None, element_ids=None):
+        '''Forces of all elements, or those in element_ids, from time start
+        to stop. Without element_ids the result is a view of the file.'''
+        columns = self.window_slice(start, stop)
+        if element_ids is None:
+            return self.forces[:, columns]
+        rows = [self.rows[element_id] for element_id in element_ids]
+        return self.forces[rows, columns]
+
+    def window_slice(self, start=None, stop=None):
+        '''Columns of times from start to, but not including, stop.'''
+        first = 0 if start is None else np.searchsorted(self.times, start)
+        last = len(self.times) if stop is None else np.searchsorted(self.times, stop)
+        return slice(first, last)
+
+
+if __name__ == '__main__':
+    avz_path = sys.argv[1]
+    out_path = sys.argv[2]
+    history = extract(avz_path, out_path)
+    print('{} elements x {} time steps written to {}.'.format(
+        *history.forces.shape, out_path))
@@ -8,10 +8,36 @@ from util import *
 from scipy.constants import pi, g
 
 
-def make_env_AP(path, decimal=b',', sep='\t', col_names=None):
+# Return periods [years] of waves, wind and current in each combination.
+# With ocean, the waves are ocean waves (Hs_10_hav etc.). Combinations
+# whose waves are not in the table are left out.
+COMBINATIONS = [
+    {"waves": 10, "wind": 10, "current": 50},
+    {"waves": 50, "wind": 50, "current": 10},
+    {"waves": 10, "wind": 10, "current": 50, "ocean": True},
+    {"waves": 50, "wind": 50, "current": 10, "ocean": True},
+]
+
+
+def _columns(combination):
+    '''Columns of the Akvaplan-niva table used by combination.'''
+    suffix = "_hav" if combination.get("ocean") else ""
+    return {"hs": "Hs_{}{}".format(combination["waves"], suffix),
+            "tp": "Tp_{}{}".format(combination["waves"], suffix),
+            "vind": "vind_{}".format(combination["wind"]),
+            "strom5": "justert_5_{}".format(combination["current"]),
+            "strom15": "justert_15_{}".format(combination["current"])}
+
+
+def make_env_AP(path, decimal=b',', sep='\t', col_names=None,
+                combinations=None):
     '''Reads Akvaplan-niva environmental data from 
     .csv-file, without headers, and returns it in 
-    properly formatted DataFrame.'''
+    properly formatted DataFrame.
+    There is one load case per sector for every combination of return
+    periods in combinations, COMBINATIONS by default. Waves and wind are
+    taken from the row with the largest waves in the sector, and each
+    current from the row with the largest current.'''
     AP_env = pd.read_csv(path, decimal=decimal, sep=sep, header=None)
     if not col_names:
         col_names = ['retning_strom',
@@ -25,68 +51,40 @@ def make_env_AP(path, decimal=b',', sep='\t', col_names=None):
                      'Hs_50', 'Tp_50']
     AP_env.columns = col_names
 
-    AP_env["himmelretning"] = AP_env["retning_vind"].apply(direction)
-    AP_env["sektor"] = AP_env["retning_vind"].apply(lambda r: direction(r, numeric=False))
-    idx_df = AP_env.groupby("himmelretning").idxmax()
-
-    env105050 = pd.DataFrame({
-        "sektor": AP_env["sektor"][idx_df["Hs_10"]].values,
-        "hs": AP_env["Hs_10"][idx_df["Hs_10"]].values,
-        "tp": AP_env["Tp_10"][idx_df["Hs_10"]].values,
-        "vind": AP_env["vind_10"][idx_df["Hs_10"]].values,
-        "vindretn": AP_env["retning_vind"][idx_df["Hs_10"]].values,
-        "strom5": AP_env["justert_5_50"][idx_df["justert_5_50"]].values / 100,
-        "strom5retn": AP_env["retning_strom"][idx_df["justert_5_50"]].values,
-        "strom15": AP_env["justert_15_50"][idx_df["justert_15_50"]].values / 100,
-        "strom15retn": AP_env["retning_strom"][idx_df["justert_15_50"]].values
-    })
-
-    env501010 = pd.DataFrame({
-        "sektor": AP_env["sektor"][idx_df["Hs_50"]].values,
-        "hs": AP_env["Hs_50"][idx_df["Hs_50"]].values,
-        "tp": AP_env["Tp_50"][idx_df["Hs_50"]].values,
-        "vind": AP_env["vind_50"][idx_df["Hs_50"]].values,
-        "vindretn": AP_env["retning_vind"][idx_df["Hs_50"]].values,
-        "strom5": AP_env["justert_5_10"][idx_df["justert_5_10"]].values / 100,
-        "strom5retn": AP_env["retning_strom"][idx_df["justert_5_10"]].values,
-        "strom15": AP_env["justert_15_10"][idx_df["justert_15_10"]].values / 100,
-        "strom15retn": AP_env["retning_strom"][idx_df["justert_15_10"]].values
-    })
-
-    if "Hs_10_hav" in AP_env:
-        idx_df_hav = idx_df.dropna()
-
-        env105050_hav = pd.DataFrame({
-            "sektor": AP_env["sektor"][idx_df_hav["Hs_10_hav"]].values,
-            "hs": AP_env["Hs_10_hav"][idx_df_hav["Hs_10_hav"]].values,
-            "tp": AP_env["Tp_10_hav"][idx_df_hav["Hs_10_hav"]].values,
-            "vind": AP_env["vind_10"][idx_df_hav["Hs_10_hav"]].values,
-            "vindretn": AP_env["retning_vind"][idx_df_hav["Hs_50_hav"]].values,
-            "strom5": AP_env["justert_5_50"][idx_df_hav["justert_5_50"]].values / 100,
-            "strom5retn": AP_env["retning_strom"][idx_df_hav["justert_5_50"]].values,
-            "strom15": AP_env["justert_15_50"][idx_df_hav["justert_15_50"]].values / 100,
-            "strom15retn": AP_env["retning_strom"][idx_df_hav["justert_15_50"]].values
-        })
+    AP_env["himmelretning"] = sectors(AP_env["retning_vind"])
+    AP_env["sektor"] = sectors(AP_env["retning_vind"], numeric=False)
+    if combinations is None:
+        combinations = COMBINATIONS
+    combinations = [combination for combination in combinations
+                    if _columns(combination)["hs"] in AP_env]
 
-        env501010_hav = pd.DataFrame({
-            "sektor": AP_env["sektor"][idx_df_hav["Hs_50_hav"]].values,
-            "hs": AP_env["Hs_50_hav"][idx_df_hav["Hs_50_hav"]].values,
-            "tp": AP_env["Tp_50_hav"][idx_df_hav["Hs_50_hav"]].values,
-            "vind": AP_env["vind_50"][idx_df_hav["Hs_50_hav"]].values,
-            "vindretn": AP_env["retning_vind"][idx_df_hav["Hs_50_hav"]].values,
-            "strom5": AP_env["justert_5_10"][idx_df_hav["justert_5_10"]].values / 100,
-            "strom5retn": AP_env["retning_strom"][idx_df_hav["justert_5_10"]].values,
-            "strom15": AP_env["justert_15_10"][idx_df_hav["justert_15_10"]].values / 100,
-            "strom15retn": AP_env["retning_strom"][idx_df_hav["justert_15_10"]].values
-        })
+    # Row of the largest value in each sector, for all governing columns
+    governing = list(dict.fromkeys(
+        _columns(combination)[name] for combination in combinations
+        for name in ("hs", "strom5", "strom15")))
+    idx_df = AP_env.groupby("himmelretning")[governing].idxmax()
 
-        env105050_hav.index += env501010.index[-1] + 1
-        env501010_hav.index += env105050_hav.index[-1] + 1
-        env501010 = pd.concat([env501010, env105050_hav, env501010_hav])
+    env_cases = []
+    for combination in combinations:
+        columns = _columns(combination)
+        wave_idx = idx_df[columns["hs"]].dropna().astype(int).to_numpy()
+        current_idx = idx_df.loc[idx_df[columns["hs"]].notna()]
+        strom5_idx = current_idx[columns["strom5"]].astype(int).to_numpy()
+        strom15_idx = current_idx[columns["strom15"]].astype(int).to_numpy()
+        env_cases.append(pd.DataFrame({
+            "sektor": AP_env["sektor"].to_numpy()[wave_idx],
+            "hs": AP_env[columns["hs"]].to_numpy()[wave_idx],
+            "tp": AP_env[columns["tp"]].to_numpy()[wave_idx],
+            "vind": AP_env[columns["vind"]].to_numpy()[wave_idx],
+            "vindretn": AP_env["retning_vind"].to_numpy()[wave_idx],
+            "strom5": AP_env[columns["strom5"]].to_numpy()[strom5_idx] / 100,
+            "strom5retn": AP_env["retning_strom"].to_numpy()[strom5_idx],
+            "strom15": AP_env[columns["strom15"]].to_numpy()[strom15_idx] / 100,
+            "strom15retn": AP_env["retning_strom"].to_numpy()[strom15_idx]
+        }))
 
-    env105050.index += 1
-    env501010.index += 9
-    env_final = pd.concat([env105050, env501010])
+    env_final = pd.concat(env_cases, ignore_index=True)
+    env_final.index += 1
     env_final["steilhet"] = (env_final["tp"]**2 / env_final["hs"]) * (g / (1.9 * 2 * pi))
     return env_final
 
@@ -41,8 +41,8 @@ def _read_mc_waves(path):
             mc_wave_data[nice_list[0]] = [float(val) for val in nice_list[1:]]
 
     mc_waves = {
-        "sektor": np.array([direction(val, False) 
-            for val in mc_wave_data["retning_vind_10"] + mc_wave_data["retning_vind_10"]]),
+        "sektor": sectors(mc_wave_data["retning_vind_10"]
+                          + mc_wave_data["retning_vind_10"], numeric=False),
         "hs": np.array(mc_wave_data["Hs_10"] + mc_wave_data["Hs_50"]),
         "tp": np.array(mc_wave_data["Tp_10"] + mc_wave_data["Tp_50"]),
         "vind": np.array(mc_wave_data["vind_10"] + mc_wave_data["vind_50"]),
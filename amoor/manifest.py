@@ -0,0 +1,87 @@
+"""
+Build manifest for handler.py.
+
+For every output the manifest records the fingerprints of the inputs it
+was built from, and the amoor version that built it. An output is rebuilt
+when it is missing, was built by another version, or when any input
+fingerprint has changed. Modification times are not used, so copying a
+result tree does not force a rebuild and restoring an old file does.
+"""
+import os
+import json
+import zlib
+import zipfile
+from pathlib import Path
+from amoor import __version__
+
+
+def fingerprint(path):
+    '''Return fingerprint string of file at path, or None if missing.
+    .avz-files use the CRC32 values stored in the zip directory, so they
+    are not decompressed. Other files are hashed with CRC32.'''
+    path = Path(path)
+    if not path.exists():
+        return None
+    if path.suffix == '.avz' and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zfile:
+            return 'zip:' + ';'.join(
+                '{}:{:08x}:{}'.format(info.filename, info.CRC, info.file_size)
+                for info in zfile.infolist())
+    crc = 0
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return 'crc:{:08x}:{}'.format(crc, path.stat().st_size)
+
+
+class Manifest:
+    '''Persisted map from output path to the fingerprints of its inputs.'''
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self._fingerprints = {}
+        if self.path.exists():
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file)
+
+    def fingerprint(self, path):
+        '''Fingerprint of path, cached until forget(path) is called.'''
+        key = str(path)
+        if key not in self._fingerprints:
+            self._fingerprints[key] = fingerprint(path)
+        return self._fingerprints[key]
+
+    def forget(self, path):
+        '''Drop the cached fingerprint of path, after it is rewritten.'''
+        self._fingerprints.pop(str(path), None)
+
+    def needs_build(self, output, inputs, stale=()):
+        '''Returns True if output must be built from inputs. Inputs in
+        stale are taken as changed, which is used for dry runs where
+        upstream outputs are not rebuilt.'''
+        if not Path(output).exists():
+            return True
+        if any(str(path) in stale for path in inputs):
+            return True
+        entry = self.entries.get(str(output))
+        if entry is None or entry['version'] != __version__:
+            return True
+        current = {str(path): self.fingerprint(path) for path in inputs}
+        return current != entry['inputs']
+
+    def record(self, output, inputs):
+        '''Record that output was built from the current inputs.'''
+        self.forget(output)
+        self.entries[str(output)] = {
+            'version': __version__,
+            'inputs': {str(path): self.fingerprint(path) for path in inputs}
+        }
+
+    def save(self):
+        '''Write manifest to file. A temporary file is replaced, so an
+        interrupted run never leaves a broken manifest.'''
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(self.entries, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -6,9 +6,14 @@ Created on Wed May 23 08:28:46 2018
 """
 import sys
 import re
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from glob import glob
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from amoor.merge import read_result
 
 def reorder_to_store_order(result):
     '''
@@ -30,38 +35,69 @@ def reorder_to_store_order(result):
     return result_mod[allowed_cols]
 
 
-def _load_results(result_paths):
-    'Loads and reference results in a dict.'
-    results = {Path().joinpath(*path.parts[1:]):
-                pd.read_csv(path, index_col="id") 
-                for path in result_paths}
-    return results
+def _ref(path):
+    '''Reference of result at path, used in the source columns.'''
+    return Path().joinpath(*path.parts[1:])
+
+
+def _read_ref(path):
+    '''Reference and result of path.'''
+    return _ref(path), read_result(path)
+
+
+def _read_ahead(result_paths, num_ahead=1):
+    '''Yield reference and result for each path in result_paths.
+    Results are read by a worker thread, at most num_ahead results
+    ahead, so that reading overlaps with the reduction. Reads that are
+    not started when the consumer stops are cancelled, and the worker is
+    shut down with the generator.'''
+    paths = iter(result_paths)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = deque(executor.submit(_read_ref, path)
+                        for path in islice(paths, num_ahead))
+        try:
+            while pending:
+                item = pending.popleft().result()
+                for path in islice(paths, 1):
+                    pending.append(executor.submit(_read_ref, path))
+                yield item
+        finally:
+            for future in pending:
+                future.cancel()
 
 
 def add_lt_columns(df_result):
     '''Reads all source columns in df_result, and returns new DF with
-    corresponding LT columns added.'''
+    corresponding LT columns added. Each unique source is only parsed once.'''
     df = df_result.copy()
     header_pat = re.compile(r'(\w+)_source')
-    entry_pat = re.compile(r'(\d{1,3})merged.csv')
+    entry_pat = re.compile(r'(\d{1,3})merged\.(csv|feather)')
     source_cols = [col for col in df_result.columns if 'source' in col]
     for source_col in source_cols:
         lt_col = header_pat.search(source_col)[1] + "_lt"
-        df[lt_col] = df[source_col].apply(
-            # entry is Path object without casting
-            lambda entry: int(entry_pat.search(str(entry))[1])
-        )
+        codes, sources = pd.factorize(df[source_col])
+        lts = np.array([
+            # source is Path object without casting
+            int(entry_pat.search(str(source))[1]) for source in sources
+        ], dtype=np.int64)
+        df[lt_col] = lts[codes]
+        if (codes < 0).any():
+            # Code -1 is a missing source, which has no LT
+            df[lt_col] = df[lt_col].where(codes >= 0)
     return df
 
 
 def summarize(result_paths):
-    '''Summarizes all results in df_list
-    with correct indices, and sources from ref_list.'''
+    '''Summarizes all results in result_paths, which may be any iterable
+    of paths, with correct indices, and sources from ref_list.
+
+    Each load case is folded into a running envelope as it is read, so
+    memory use stays around two results however many load cases there are.
+    Load cases are aligned on id.'''
 
-    results = _load_results(result_paths)
-    base_ref = list(results.keys())[0]
-    df1 = results[base_ref]
-    df_final = df1.copy(deep=True)
+    results = _read_ahead(result_paths)
+    base_ref, df_final = next(results)
+    index = df_final.index
     # Interdependent columns. Will be updated together. Not sure if right_web
     # should be here. But should be together with conv_norm.
     force_columns = ['force', 'load', 'load_limit', 'right_web',
@@ -76,26 +112,44 @@ def summarize(result_paths):
     # Add source columns
     for source in source_columns:
         df_final[source] = base_ref
-    
-    for ref, df in results.items():
-        if ref == base_ref:
-            continue
-        # Filters
-        is_more_utilized = df['utilization'] > df_final['utilization']
-        is_bigger_zmin = df['min_zload'] > df_final['min_zload']
-        is_bigger_zmax = df['max_zload'] > df_final['max_zload']
-        # Update values
-        df_final.loc[is_more_utilized, force_columns] = df.loc[is_more_utilized, force_columns]
-        df_final.loc[is_bigger_zmax, 'max_zload'] = df.loc[is_bigger_zmax, 'max_zload']
-        df_final.loc[is_bigger_zmax, 'max_zforce'] = df.loc[is_bigger_zmax, 'max_zforce']
-        df_final.loc[is_bigger_zmin, 'min_zload'] = df.loc[is_bigger_zmin, 'min_zload']
-        df_final.loc[is_bigger_zmax, 'min_zforce'] = df.loc[is_bigger_zmax, 'min_zforce']
-        # Update sources
-        df_final.loc[is_more_utilized, 'force_source'] = ref
-        df_final.loc[is_more_utilized, 'conv_norm_source'] = ref
-        df_final.loc[is_more_utilized, 'right_web_source'] = ref
-        df_final.loc[is_bigger_zmin, 'min_zload_source'] = ref
-        df_final.loc[is_bigger_zmax, 'max_zload_source'] = ref
+    # criterion: (columns updated with it, its source columns)
+    # min_zforce has always followed max_zload, and is kept that way.
+    criteria = {
+        'utilization': (force_columns,
+                        ['force_source', 'conv_norm_source', 'right_web_source']),
+        'max_zload': (['max_zload', 'max_zforce', 'min_zforce'],
+                      ['max_zload_source']),
+        'min_zload': (['min_zload'], ['min_zload_source'])
+    }
+    # Running envelope, as writable arrays. Sources are kept as codes
+    # into refs, and become categorical columns at the end.
+    envelope = {column: df_final[column].to_numpy(copy=True)
+                for columns, _ in criteria.values()
+                for column in columns}
+    refs = [base_ref]
+    source_codes = {source: np.zeros(len(index), dtype=np.int32)
+                    for source in source_columns}
+
+    for ref, df in results:
+        refs.append(ref)
+        df = df.reindex(index)
+        # Strictly bigger, so ties keep the first load case and NaN never wins
+        is_bigger = {criterion: df[criterion].to_numpy() > envelope[criterion]
+                     for criterion in criteria}
+        for criterion, (columns, sources) in criteria.items():
+            mask = is_bigger[criterion]
+            if not mask.any():
+                continue
+            for column in columns:
+                envelope[column][mask] = df[column].to_numpy()[mask]
+            for source in sources:
+                source_codes[source][mask] = len(refs) - 1
+
+    for column, values in envelope.items():
+        df_final[column] = pd.Series(values, index=index,
+                                     dtype=df_final[column].dtype)
+    for source, codes in source_codes.items():
+        df_final[source] = pd.Categorical.from_codes(codes, categories=refs)
     df_final = add_lt_columns(df_final)
     return df_final
 
@@ -1,16 +1,62 @@
 import sys
+import logging
+from pathlib import Path
 import pandas as pd
 
 
+def read_result(path):
+	'''Read intermediate result, indexed by id. Files ending with .feather
+	are memory-mapped, and numeric columns are read without copying.
+	Other files are read as csv.'''
+	if Path(path).suffix == '.feather':
+		from pyarrow import feather
+		table = feather.read_table(path, memory_map=True)
+		return table.to_pandas(split_blocks=True).set_index('id')
+	return pd.read_csv(path, index_col="id")
+
+
+def write_result(df, path, csv_copy=False):
+	'''Write intermediate result, indexed by id. Files ending with .feather
+	are written uncompressed, so that they can be memory-mapped, and a csv
+	copy is written next to them if csv_copy is True.
+	Other files are written as csv.'''
+	path = Path(path)
+	if path.suffix == '.feather':
+		from pyarrow import feather
+		feather.write_feather(df.reset_index(), path,
+		                      compression='uncompressed')
+		if csv_copy:
+			df.to_csv(path.with_suffix('.csv'))
+	else:
+		df.to_csv(path)
+
+
+def check_length(merged, tolerance=0.01, name=''):
+	'''Log a warning for elements where the geometric length of the mesh,
+	geo_length, differs from length of the key-file by more than tolerance,
+	relative to length. Returns ids of those elements.'''
+	if 'geo_length' not in merged or 'length' not in merged:
+		return merged.index[:0]
+	deviation = (merged['geo_length'] - merged['length']).abs()
+	is_off = deviation > tolerance * merged['length'].abs()
+	ids = merged.index[is_off]
+	if len(ids):
+		logging.warning('{}: geometric length differs from key length in '
+		                '{} elements, ids {}.'.format(
+		                    name, len(ids), ', '.join(map(str, ids[:10]))))
+	return ids
+
+
 def merge(pfat_path, key_path, out_path=None):
-	'Inner join *PFAT.csv with *key.csv.'
+	'Inner join *PFAT with *key, read as csv or feather.'
 
 	# key_path = pfat_path[:-8] + 'key.csv'
-	pfat_df = pd.read_csv(pfat_path, index_col="id")
-	key_df = pd.read_csv(key_path, index_col="id")
+	pfat_df = read_result(pfat_path)
+	key_df = read_result(key_path)
 	merged = pd.merge(pfat_df, key_df, left_index=True, right_index=True)
+	check_length(merged, name=str(pfat_path))
 	if out_path:
-		merged.to_csv(out_path)
+		write_result(merged, out_path)
 	else:
 		return merged
 
@@ -19,4 +65,4 @@ if __name__ == '__main__':
 	pfat_path = sys.argv[1]
 	key_path = sys.argv[2]
 	out_path = sys.argv[3]
-	merge(pfat_path, key_path, out_path)
\ No newline at end of file
+	merge(pfat_path, key_path, out_path)
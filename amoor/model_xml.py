@@ -0,0 +1,110 @@
+"""
+Reader of model.xml, the model description inside .avz-files.
+
+The document is parsed incrementally in one pass by a parser target that
+keeps only the attributes it needs, so no element tree is built.
+Components, environment loads and their currents come back as arrays.
+Results are cached per file, so read_avz and load_conditions share one
+parse of the same archive.
+"""
+import os
+import zipfile
+import numpy as np
+import xml.etree.ElementTree as et
+from functools import lru_cache
+
+COMPONENT_KEYS = ['id', 'number', 'name', 'materialcoeff', 'breakingload']
+
+
+def read_model_xml(path):
+    '''Read model.xml of .avz-file at path, or the .xml-file at path.
+    Returns dictionary with
+    components ==> dictionary of arrays, one per COMPONENT_KEYS, as text
+    loads      ==> dictionary of arrays, one per attribute of the first
+                   environment load, as text
+    velocity   ==> (loads x 2) array of the first two current velocities
+    direction  ==> (loads x 2) array of their directions
+    The returned arrays are shared between callers and must not be
+    changed.'''
+    path = str(path)
+    return _read_cached(path, _stamp(path))
+
+
+def _stamp(path):
+    '''Changes when the model.xml at path changes. .avz-files use the
+    CRC32 stored in the zip directory.'''
+    if path[-4:] == '.avz':
+        with zipfile.ZipFile(path) as zfile:
+            info = zfile.getinfo('model.xml')
+            return info.CRC, info.file_size
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=8)
+def _read_cached(path, stamp):
+    if path[-4:] == '.avz':
+        with zipfile.ZipFile(path) as zfile:
+            with zfile.open('model.xml') as file:
+                return _parse(file)
+    with open(path, 'rb') as file:
+        return _parse(file)
+
+
+class _ModelTarget:
+    '''Parser target that keeps only the attributes it needs, so no tree
+    is built. Elements are placed by their position, as in root[0][i] for
+    load i, and root[0][i][0][j] for its current j.'''
+
+    def __init__(self):
+        self.components = {key: [] for key in COMPONENT_KEYS}
+        self.loads = []
+        self.currents = []
+        self.position = []  # Child number of each open element, root last
+        self.num_children = [0]
+
+    def start(self, tag, attrib):
+        position = self.num_children[-1]
+        self.num_children[-1] += 1
+        self.num_children.append(0)
+        self.position.append(position)
+        if tag == 'component':
+            for key in COMPONENT_KEYS:
+                self.components[key].append(attrib[key])
+        depth = len(self.position) - 1
+        if depth == 2 and self.position[1] == 0:
+            self.loads.append(attrib)
+            self.currents.append([])
+        elif (depth == 4 and self.position[1] == 0 and self.position[3] == 0
+              and position < 2):
+            self.currents[-1].append(attrib)
+
+    def end(self, tag):
+        self.position.pop()
+        self.num_children.pop()
+
+    def close(self):
+        load_keys = list(self.loads[0].keys()) if self.loads else []
+        currents = [[(current['velocity'], current['direction'])
+                     for current in pair] for pair in self.currents]
+        currents = np.array(currents, dtype=np.float64).reshape(-1, 2, 2)
+        return {
+            'components': {key: np.array(values, dtype=str)
+                           for key, values in self.components.items()},
+            'loads': {key: np.array([load[key] for load in self.loads],
+                                    dtype=str)
+                      for key in load_keys},
+            'velocity': currents[:, :, 0],
+            'direction': currents[:, :, 1]
+        }
+
+
+def _parse(file, chunk_bytes=1 << 20):
+    '''Parse model.xml from binary file in chunks. Loads are the children
+    of the first child of the root, and their currents are the first two
+    children of the first child of each load. The text is decoded as
+    Latin-1.'''
+    parser = et.XMLParser(target=_ModelTarget())
+    for chunk in iter(lambda: file.read(chunk_bytes), b''):
+        parser.feed(chunk.decode('Latin-1'))
+    return parser.close()
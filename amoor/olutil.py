@@ -1,9 +1,54 @@
 import sys
 import gzip as gz
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 import folium as fl
+from folium.plugins import MarkerCluster
 from geographiclib.geodesic import Geodesic
 
+MARKER_LIMIT = 1000  # Points drawn as markers by plot_map
+
+
+@lru_cache(maxsize=1 << 16)
+def _inverse(lat1, long1, lat2, long2):
+    geodict = Geodesic.WGS84.Inverse(lat1, long1, lat2, long2)
+    return geodict['s12'], (geodict['azi1'] + 360) % 360
+
+
+@lru_cache(maxsize=1 << 16)
+def _direct(lat1, long1, azi1, s12):
+    geodict = Geodesic.WGS84.Direct(lat1, long1, azi1, s12)
+    return geodict['lat2'], geodict['lon2']
+
+
+def _batch(function, *arrays):
+    '''Apply scalar function to each row of the broadcast arrays. Equal
+    rows are computed once, and rows seen before are taken from the cache
+    of function. Returns one array per output of function.'''
+    rows = np.column_stack([array.ravel() for array in
+                            np.broadcast_arrays(*map(np.asarray, arrays))])
+    rows = rows.astype(np.float64)
+    shape = np.broadcast(*arrays).shape
+    if not len(rows):
+        return tuple(np.empty(shape) for _ in range(2))
+    unique_rows, where = np.unique(rows, axis=0, return_inverse=True)
+    outputs = np.array([function(*row) for row in unique_rows.tolist()])
+    return tuple(outputs[where.ravel(), i].reshape(shape)
+                 for i in range(outputs.shape[1]))
+
+
+def inverse_geodesic(lat1, long1, lat2, long2):
+    '''Length [m] and azimuth [deg, 0 to 360] at the first point of the
+    WGS84 geodesics between arrays of points, in decimal degrees.'''
+    return _batch(_inverse, lat1, long1, lat2, long2)
+
+
+def direct_geodesic(lat1, long1, azimuth, length):
+    '''Latitude and longitude [decimal degrees] reached by following the
+    WGS84 geodesics from arrays of points with azimuth [deg] for length [m].'''
+    return _batch(_direct, lat1, long1, azimuth, length)
+
 
 def _format_degree_minutes(latitude, longitude):
     '''Format from decimal minutes to degrees decimal minutes.'''
@@ -19,103 +64,162 @@ def _format_degree_minutes(latitude, longitude):
         .format(h_lat, min_lat, h_long, min_long)
 
 
+def _formatted(olex_df):
+    '''Degrees decimal minutes of every row of olex_df, as given by Olex.
+    Olex gives minutes with 7 decimals, which rounding recovers exactly.'''
+    minutes = np.round(olex_df[["latitude", "longitude"]].to_numpy() * 60, 7)
+    return [_format_degree_minutes(latitude, longitude)
+            for latitude, longitude in minutes.tolist()]
+
+
+def _iter_olex_blocks(path):
+    '''Yield each plot set of the olex file at path as a list of points,
+    [latitude, longitude, timestamp, symbol, given_name], with latitude and
+    longitude in decimal minutes. Only lines inside plot sets are decoded,
+    other lines, like route names and colours, are skipped as bytes.'''
+    with gz.open(path) as file:
+        points = None
+        for line in file:
+            if points is not None:
+                # Stop reading block
+                if line == b"\n":
+                    yield points
+                    points = None
+                else:
+                    data_list = line.decode("cp1252").split()
+                    if data_list[0] == "Navn":
+                        # Overwrite None with given_name if it exists
+                        points[-1][4] = data_list[1]
+                    else:
+                        points.append([float(data_list[0]),
+                                       float(data_list[1]),
+                                       float(data_list[2]),
+                                       data_list[3],
+                                       None])
+            # Start reading block
+            if b"Plottsett" in line:
+                points = []
+        if points:
+            yield points
+
+
+def _olex_columns(points, blocks):
+    '''Columns of points from _iter_olex_blocks, and their block numbers.'''
+    latitude, longitude, timestamp, symbol, given_name = zip(*points)
+    # latitude and longitude is given as decimal minutes
+    return {"given_name": list(given_name),
+            "latitude": np.array(latitude) / 60,
+            "longitude": np.array(longitude) / 60,
+            "block": np.array(blocks, dtype=np.int64),
+            "timestamp": np.array(timestamp),
+            "symbol": list(symbol)}
+
+
+def iter_olex_chunks(path, chunk_rows=1 << 16):
+    '''Read olex file from given path, and yield its points as
+    dictionaries of columns with about chunk_rows points each. Blocks are
+    not split between chunks. The formatted column is left out, see
+    _formatted.'''
+    points = []
+    blocks = []
+    for block_id, block in enumerate(_iter_olex_blocks(path), 1):
+        points += block
+        blocks += [block_id] * len(block)
+        if len(points) >= chunk_rows:
+            yield _olex_columns(points, blocks)
+            points = []
+            blocks = []
+    if points:
+        yield _olex_columns(points, blocks)
+
+
+def write_olex_chunks(path, out_path, chunk_rows=1 << 16):
+    '''Write points of olex file at path to a feather file at out_path,
+    one record batch per chunk of iter_olex_chunks, so that memory use
+    stays flat. Returns the number of points.'''
+    import pyarrow as pa
+    schema = pa.schema([("given_name", pa.string()),
+                        ("latitude", pa.float64()),
+                        ("longitude", pa.float64()),
+                        ("block", pa.int64()),
+                        ("timestamp", pa.float64()),
+                        ("symbol", pa.string())])
+    num_points = 0
+    with pa.OSFile(str(out_path), "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for chunk in iter_olex_chunks(path, chunk_rows):
+                writer.write_batch(
+                    pa.RecordBatch.from_pydict(chunk, schema=schema))
+                num_points += len(chunk["block"])
+    return num_points
+
+
 def _read_olex_object_export(path):
     '''Reads olex file from given path
-    and returns a dictionary with the data.'''
+    and returns a dictionary with the data, without the formatted column.'''
     header = ["given_name",
               "latitude",
               "longitude",
               "block",
               "timestamp",
-              "formatted",
               "symbol"]
     data = {name: [] for name in header}
-    block_id = 1
-
-    with gz.open(path) as file:
-        is_block = False
-        for line in file:
-            nice_line = line.decode("cp1252")
-
-            # Stop reading block
-            if "\n" == nice_line and is_block:
-                is_block = False
-                block_id += 1
-            
-            # Do block business
-            if is_block:
-                data_list = nice_line.split()
-
-                if data_list[0] == "Navn":
-                    # Overwrite None with given_name if it exists
-                    data["given_name"][-1] = data_list[1]
-                else:
-                    latitude = float(data_list[0])
-                    longitude = float(data_list[1])
-                    data["given_name"].append(None)
-                    # latitude and longitude is given as decimal minutes
-                    data["latitude"].append(latitude / 60)
-                    data["longitude"].append(longitude / 60)
-                    data["block"].append(block_id)
-                    data["timestamp"].append(float(data_list[2]))
-                    data["formatted"].append(
-                        _format_degree_minutes(latitude, longitude)
-                    )
-                    data["symbol"].append(data_list[3])
-            # Start reading block
-            if "Plottsett" in nice_line:
-                is_block = True
+    for chunk in iter_olex_chunks(path):
+        for name in header:
+            data[name].extend(chunk[name])
     return data
 
 
-def _make_olex_df(data, only_named=False):
+def _make_olex_df(data, only_named=False, formatted=True):
     '''Reads data dictionary and makes DataFrame.
-    If only_named is True, then only the named coordinates are returned.'''
+    If only_named is True, then only the named coordinates are returned.
+    If formatted is True, the formatted column is made for the returned
+    rows.'''
     olex_df = _remove_single_points(pd.DataFrame(data))
     olex_df = _correct_line_dir(olex_df)
     if only_named:
         name_filter = pd.notna(olex_df.given_name)
-        return olex_df.loc[name_filter]
+        olex_df = olex_df.loc[name_filter].copy()
+    if formatted:
+        olex_df.insert(olex_df.columns.get_loc("symbol"), "formatted",
+                       _formatted(olex_df))
     return olex_df
 
 
 def _remove_single_points(olex_df):
     '''Remove all single points from olex_df. That is, remove any block
-    with only one coordinate. Function assumes that blocks appear in either 
-    ascending or descending order.'''
-    is_duplicated = []
-    # Special case: First row
-    is_duplicated.append(olex_df.block[0] == olex_df.block[1])
-
-    for i in range(1, len(olex_df)-1):
-        tail = olex_df.block[i-1]
-        current = olex_df.block[i]
-        head = olex_df.block[i+1]
-        is_duplicated.append(current == tail or current == head)
-
-    # Special case: Last row
-    is_duplicated.append(
-        olex_df.block[len(olex_df)-1] == olex_df.block[len(olex_df)-2]
-    )
+    with only one coordinate. Function assumes that the rows of each block
+    are next to each other.'''
+    block = olex_df["block"].to_numpy()
+    is_like_next = block[1:] == block[:-1]
+    is_duplicated = (np.concatenate(([False], is_like_next))
+                     | np.concatenate((is_like_next, [False])))
     return olex_df.loc[is_duplicated]
 
 
+def _block_starts(olex_df):
+    '''Row position where each block of olex_df starts, and the size of
+    each block. Rows of a block must be next to each other.'''
+    block = olex_df["block"].to_numpy()
+    starts = np.flatnonzero(np.concatenate(([True], block[1:] != block[:-1])))
+    sizes = np.diff(np.append(starts, len(block)))
+    return starts, sizes
+
+
 def _correct_line_dir(olex_df):
     '''If a block contains two coordinates and "Brunsirkel" appears last,
-    then the coordinates are swapped.'''
+    then the coordinates are swapped. The given name stays last.'''
     df_block = olex_df.set_index("block")
-
-    for block_nr in olex_df["block"].unique():
-        block = df_block.loc[block_nr].copy(False)  # Shallow copy 
-        is_pair = len(block) == 2
-        first_is_not_bs = block["symbol"].iloc[0] != "Brunsirkel"
-        last_is_bs = block["symbol"].iloc[1] == "Brunsirkel"
-
-        if is_pair and first_is_not_bs and last_is_bs:
-            block.iloc[0, 1:], block.iloc[1, 1:] = (
-                block.iloc[1, 1:],block.iloc[0, 1:]
-            )
-
+    starts, sizes = _block_starts(olex_df)
+    symbol = df_block["symbol"].to_numpy()
+    firsts = starts[sizes == 2]
+    is_swapped = ((symbol[firsts] != "Brunsirkel")
+                  & (symbol[firsts + 1] == "Brunsirkel"))
+    firsts = firsts[is_swapped]
+    order = np.arange(len(df_block))
+    order[firsts], order[firsts + 1] = firsts + 1, firsts
+    for column in df_block.columns[1:]:  # All but given_name
+        df_block[column] = df_block[column].to_numpy()[order]
     return df_block.reset_index()
 
 
@@ -128,77 +232,204 @@ def _get_named_blocks(olex_df):
 
 def _calculate_geodesic(olex_df):
     '''Calculate line length and azimuthal angle from olex_df.
-    Return DataFrame with the values and anchor names'''
-    named_blocks = _get_named_blocks(olex_df)
-    olex_block_df = olex_df.set_index('block')
-    points = []
-    lines = {'length': [], 'azimuth': [], 'anchor_name': []}
-    
-    for block_nr in named_blocks:
-        olex_df_slice = olex_block_df.loc[block_nr]
-        points.clear()
-        anker = None
-        ramme = None
-        if isinstance(olex_df_slice, pd.DataFrame):
-            for _, row in olex_df_slice.iterrows():
-                is_named = pd.notna(row.given_name)
-                lat = row.latitude
-                long = row.longitude
-                if is_named:
-                    given_name = row.given_name
-                    anker = (lat, long)
-                else:
-                    ramme = (lat, long)
-                if anker and ramme:
-                    geodict = Geodesic.WGS84.Inverse(*ramme, *anker)
-                    lengde = geodict['s12']
-                    azimuth = (geodict['azi1'] + 360) % 360
-                    lines['length'].append(lengde)
-                    lines['azimuth'].append(azimuth)
-                    lines['anchor_name'].append(given_name)
+    Return DataFrame with the values and anchor names.
+    Within a block, every row after both an anchor (named) and a frame
+    (unnamed) point has been seen gives a line from the latest frame point
+    to the latest anchor point.'''
+    starts, sizes = _block_starts(olex_df)
+    block_start = np.repeat(starts, sizes)
+    is_named = pd.notna(olex_df["given_name"]).to_numpy()
+    positions = np.arange(len(olex_df))
+    anchor = np.maximum.accumulate(np.where(is_named, positions, -1))
+    frame = np.maximum.accumulate(np.where(is_named, -1, positions))
+    is_line = (anchor >= block_start) & (frame >= block_start)
+    anchor = anchor[is_line]
+    frame = frame[is_line]
+    latitude = olex_df["latitude"].to_numpy()
+    longitude = olex_df["longitude"].to_numpy()
+    length, azimuth = inverse_geodesic(latitude[frame], longitude[frame],
+                                       latitude[anchor], longitude[anchor])
+    lines = {
+        'length': length,
+        'azimuth': azimuth,
+        'anchor_name': olex_df["given_name"].to_numpy()[anchor].tolist()
+    }
     return pd.DataFrame(lines)
 
 
-def plot_map(olex_path):
+def _line_tooltips(olex_df):
+    '''Tooltip of every line (block) in olex_df, with its length and, for
+    named lines, the bearing from the first to the second point.
+    Returns row position where each line starts, its size and tooltip.'''
+    starts, sizes = _block_starts(olex_df)
+    latitude = olex_df["latitude"].to_numpy()
+    longitude = olex_df["longitude"].to_numpy()
+    is_named = np.isin(olex_df["block"].to_numpy()[starts],
+                       _get_named_blocks(olex_df))
+
+    # Length of each line is the sum over its segments, and the bearing is
+    # the azimuth of its first segment
+    is_segment = np.ones(len(olex_df), dtype=bool)
+    is_segment[starts + sizes - 1] = False
+    firsts = np.flatnonzero(is_segment)
+    lengths, azimuths = inverse_geodesic(latitude[firsts], longitude[firsts],
+                                         latitude[firsts + 1],
+                                         longitude[firsts + 1])
+    block_of_row = np.repeat(np.arange(len(starts)), sizes)
+    s12s = np.bincount(block_of_row[firsts], lengths, len(starts))
+    bearings = np.zeros(len(starts))
+    bearings[block_of_row[starts[sizes > 1]]] = azimuths[
+        np.searchsorted(firsts, starts[sizes > 1])]
+
+    tooltips = ['{:3.1f} m'.format(s12) for s12 in s12s]
+    for i in np.flatnonzero(is_named):
+        tooltips[i] += ', {:3.1f}\N{degree sign}'.format(bearings[i])
+    return starts, sizes, tooltips
+
+
+def _olex_geojson(olex_df, starts, sizes, tooltips):
+    '''GeoJSON feature collections of all points and of all lines in
+    olex_df. Points have given_name and formatted as properties, and lines
+    have tooltip.'''
+    coordinates = np.column_stack((olex_df["longitude"].to_numpy(),
+                                   olex_df["latitude"].to_numpy()))
+    coordinates = coordinates.round(7).tolist()
+    names = olex_df["given_name"].fillna("").tolist()
+    points = {"type": "FeatureCollection", "features": [
+        {"type": "Feature",
+         "geometry": {"type": "Point", "coordinates": point},
+         "properties": {"given_name": name, "formatted": formatted}}
+        for point, name, formatted
+        in zip(coordinates, names, olex_df["formatted"].tolist())
+    ]}
+    lines = {"type": "FeatureCollection", "features": [
+        {"type": "Feature",
+         "geometry": {"type": "LineString",
+                      "coordinates": coordinates[start:start+size]},
+         "properties": {"tooltip": tooltip}}
+        for start, size, tooltip in zip(starts, sizes, tooltips)
+    ]}
+    return points, lines
+
+
+def plot_map(olex_path, geojson=None):
     '''Plot olex map that shows anchor names, all coordinates, line length,
     and bearing. The functions that calculates bearing assumes that each line
     consists of two points, with anchor point being last. olex_df need only
-    contain latitude and longitude.'''
+    contain latitude and longitude.
+    If geojson is True, points and lines are drawn as two GeoJSON layers,
+    with points clustered in the browser, which keeps large exports fast.
+    Otherwise every point is a marker. By default, geojson is used for
+    more than MARKER_LIMIT points.'''
     data = _read_olex_object_export(olex_path)
     olex_df = _make_olex_df(data, only_named=False)
     m = fl.Map(
         location=olex_df.loc[0, ["latitude", "longitude"]].values.tolist(),
         zoom_start=15
     )
-    olex_df_blocks = olex_df.set_index("block")
-    block_nrs = olex_df["block"].unique()
-    named_blocks = _get_named_blocks(olex_df)
+    starts, sizes, tooltips = _line_tooltips(olex_df)
+    if geojson is None:
+        geojson = len(olex_df) > MARKER_LIMIT
+
+    if geojson:
+        points, lines = _olex_geojson(olex_df, starts, sizes, tooltips)
+        cluster = MarkerCluster(options={"disableClusteringAtZoom": 17})
+        cluster.add_to(m)
+        fl.GeoJson(points,
+                   tooltip=fl.GeoJsonTooltip(["given_name"], labels=False),
+                   popup=fl.GeoJsonPopup(["formatted"], labels=False)
+                   ).add_to(cluster)
+        fl.GeoJson(lines,
+                   tooltip=fl.GeoJsonTooltip(["tooltip"], labels=False)
+                   ).add_to(m)
+        return m
 
+    olex_df_blocks = olex_df.set_index("block")
     for _, row in olex_df.iterrows():
         fl.Marker([row["latitude"], row["longitude"]],
                   tooltip=row["given_name"],
                   popup=row["formatted"]).add_to(m)
 
-    for block_nr in block_nrs:
+    for block_nr, tooltip in zip(olex_df["block"].to_numpy()[starts],
+                                 tooltips):
         olex_df_slice = olex_df_blocks.loc[block_nr, ["latitude", "longitude"]]
-        s12 = 0
-        bearing = None
-        for i in range(len(olex_df_slice)-1):
-            s12 = Geodesic.WGS84.Inverse(*olex_df_slice.iloc[i+1],
-                                         *olex_df_slice.iloc[i])["s12"]
-        if block_nr in named_blocks:
-            bearing = Geodesic.WGS84.Inverse(*olex_df_slice.iloc[0],
-                                             *olex_df_slice.iloc[1])["azi1"]
-            bearing = (bearing + 360) % 360
-
-        tooltip = '{:3.1f} m'.format(s12)
-        if bearing: 
-            tooltip += ', {:3.1f}\N{degree sign}'.format(bearing)
-
         fl.PolyLine(olex_df_slice.values, tooltip=tooltip).add_to(m)
     return m
 
 
+def design_anchors(config):
+    '''Anchor positions of an amodelling Config, made by its
+    make_anchor_lines. Returns DataFrame indexed by anchor number, with
+    x and y [m] in the model plane.'''
+    names = config.anchor_config.iloc[:, 0].tolist()
+    rows = [config.node_index[name] for name in names]
+    return pd.DataFrame(config.node_pos[rows, :2], columns=["x", "y"],
+                        index=pd.Index(names, name="anchor"))
+
+
+def local_to_latlong(x, y, origin_lat, origin_long):
+    '''Latitude and longitude of model plane positions x and y [m],
+    where x is east and y is north of the origin, the position of the
+    model origin (node 301 of Config) in decimal degrees.'''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    azimuth = np.degrees(np.arctan2(x, y))
+    return direct_geodesic(origin_lat, origin_long, azimuth, np.hypot(x, y))
+
+
+def _unit_vectors(latitude, longitude):
+    '''Points on the unit sphere. Chords between them grow with the
+    distance along the surface, so nearest chords are nearest points.'''
+    lat = np.radians(latitude)
+    long = np.radians(longitude)
+    return np.column_stack((np.cos(lat) * np.cos(long),
+                            np.cos(lat) * np.sin(long),
+                            np.sin(lat)))
+
+
+def match_anchors(design, olex_paths, origin_lat, origin_long,
+                  only_named=True):
+    '''Nearest surveyed point to every design anchor. design is a
+    DataFrame with x and y [m], like from design_anchors, placed at origin
+    by local_to_latlong. Surveyed points are the named points, or all
+    points if only_named is False, of the olex files in olex_paths.
+    All points go into one KD-tree, so each anchor is one lookup.
+    Returns DataFrame indexed like design with the position of the anchor,
+    the nearest surveyed point and its source, and the offset [m] and
+    bearing [deg] from the design anchor to it.'''
+    from scipy.spatial import cKDTree
+    surveyed = []
+    for olex_path in olex_paths:
+        data = _read_olex_object_export(olex_path)
+        olex_df = _make_olex_df(data, only_named, formatted=False)
+        olex_df["source"] = str(olex_path)
+        surveyed.append(olex_df)
+    surveyed = pd.concat(surveyed, ignore_index=True)
+    if not len(surveyed):
+        raise ValueError("No surveyed points in {}.".format(olex_paths))
+
+    latitude, longitude = local_to_latlong(design["x"], design["y"],
+                                           origin_lat, origin_long)
+    tree = cKDTree(_unit_vectors(surveyed["latitude"].to_numpy(),
+                                 surveyed["longitude"].to_numpy()))
+    _, nearest = tree.query(_unit_vectors(latitude, longitude))
+    nearest_df = surveyed.iloc[nearest]
+    offset, bearing = inverse_geodesic(latitude, longitude,
+                                       nearest_df["latitude"].to_numpy(),
+                                       nearest_df["longitude"].to_numpy())
+    matches = pd.DataFrame({
+        "latitude": latitude,
+        "longitude": longitude,
+        "surveyed_name": nearest_df["given_name"].to_numpy(),
+        "surveyed_latitude": nearest_df["latitude"].to_numpy(),
+        "surveyed_longitude": nearest_df["longitude"].to_numpy(),
+        "source": nearest_df["source"].to_numpy(),
+        "offset": offset,
+        "bearing": bearing
+    }, index=design.index)
+    return matches
+
+
 def make_buildup_form(olex_path):
     '''Make build up form from olex file.'''
     data = _read_olex_object_export(olex_path)
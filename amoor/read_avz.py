@@ -4,12 +4,16 @@ Created on Wed Mar 11 11:28:46 2019
 
 @author: tordaronsen
 """
+import io
 import sys
-import xml.etree.ElementTree as et
+import logging
+from time import perf_counter
 import numpy as np
 import pandas as pd
 from scipy.constants import g
 import zipfile
+from amoor import model_xml
+from amoor.util import parse_numbers, token_counts
 
 block_map = {
     'STRESS_LINE_LIST:Local_section_forces.Max_axial_force_[N] {': 'Forces', 
@@ -21,6 +25,7 @@ block_map = {
     'STRESS_LINE_LIST:Convergence_norm {': 'Conv_norm',
     'STRESS_LINE_LIST:Convergence_norm_INDEX {': 'Conv_norm_indices'
 }
+PARSE_CHUNK = 1 << 20  # Bytes of block bodies parsed in one call
 
 
 def _model(path, is_accident, is_nice=False, to_clipboard=False):
@@ -29,175 +34,397 @@ def _model(path, is_accident, is_nice=False, to_clipboard=False):
     When to_clipboard is true MBL, Materialcoeff and Materials 
     are written to clipboard.'''
     
-    if path[-4:] == '.avz':        
-        with zipfile.ZipFile(file=path) as zfile:
-            with zfile.open('model.xml') as file:
-                root = et.XML(file.read().decode('Latin-1'))
-    elif path[-4:] == '.xml':
-        tree = et.parse('Testmiljø/Horsvaagen_90m_.xml')
-        root = tree.getroot()
-    else:
+    if path[-4:] not in ('.avz', '.xml'):
         print('Input file must be either .avz or .xml.')
         return None
+    components = model_xml.read_model_xml(path)['components']
     
     xml_header = [
     'load_limit', 'edit_id', 'materialcoeff', 'mbl', 'name',
     'component', 'material', 'id', 'is_accident'
     ]
+    mcoeff = components['materialcoeff'].astype(np.float64)
+    mbl = components['breakingload'].astype(np.float64) / (g*1000)
+    names = components['name']
     model = {header: [] for header in xml_header}
-    for comp in root.iter('component'):
-        mcoeff      = float(comp.attrib['materialcoeff'])
-        mbl         = float(comp.attrib['breakingload'])/(g*1000)
-        name        = comp.attrib['name']
-        name_list   = name.split(':')
-        model[xml_header[5]].append(name_list[0].strip())   # component
-        model[xml_header[6]].append(name_list[-1].strip())  # material
-        model[xml_header[4]].append(name)                   # name
-        model[xml_header[2]].append(float(comp.attrib['materialcoeff'])) # materialcoeff
-        model[xml_header[3]].append(mbl)                    # mbl
-        model[xml_header[7]].append(int(comp.attrib['id'])) # id
-        model[xml_header[1]].append(int(comp.attrib['number'])) # edit_id
-        if is_accident:
-            model[xml_header[0]].append(mbl/(mcoeff/1.5))   # load_limit
-            model[xml_header[8]] = True                     # is_accident
-        else:
-            model[xml_header[0]].append(mbl/(mcoeff*1.15))  # load_limit
-            model[xml_header[8]] = False                    # is_accident 
+    model[xml_header[5]] = np.char.strip(                             # component
+        np.char.partition(names, ':')[:, 0]).astype(object)
+    model[xml_header[6]] = np.char.strip(                             # material
+        np.char.rpartition(names, ':')[:, 2]).astype(object)
+    model[xml_header[4]] = names.astype(object)                       # name
+    model[xml_header[2]] = mcoeff                                     # materialcoeff
+    model[xml_header[3]] = mbl                                        # mbl
+    model[xml_header[7]] = components['id'].astype(np.int64)         # id
+    model[xml_header[1]] = components['number'].astype(np.int64)     # edit_id
+    if is_accident:
+        model[xml_header[0]] = mbl/(mcoeff/1.5)   # load_limit
+    else:
+        model[xml_header[0]] = mbl/(mcoeff*1.15)  # load_limit
+    if len(names):
+        model[xml_header[8]] = is_accident        # is_accident
     
     df_model = pd.DataFrame(data = model)
     df_model.set_index(xml_header[7], inplace=True)
     
     if is_nice:
-        df_model[[xml_header[5], 'segment']] = (
-            df_model[xml_header[5]].str.split('_', expand=True, n=1)
-        )
+        parts = np.char.partition(
+            df_model[xml_header[5]].to_numpy(dtype=str), '_')
+        df_model[xml_header[5]] = parts[:, 0].astype(object)
+        df_model['segment'] = np.where(parts[:, 1] == '_', parts[:, 2],
+                                       None).astype(object)
         df_model.loc[:, 'segment'] = df_model['segment'].astype('category')
     
     return df_model
 
 
 
-def _collect_avz_vertices(avz_path):
-    '''Parse data from file to a dictionary.'''
+def _read_avs(avz_path, blocks=None, history=None):
+    '''Parse vertices, edges and stress blocks from model.avs in one pass.
+    The archive is decompressed once and each line is dispatched to the
+    consumer of the block it belongs to. blocks defaults to all keys of
+    block_map. Returns a dictionary with "vertices", "edges", "data" and
+    "stats", where stats holds the parse rate in MB/s. vertices is an
+    array of positions, one row of x, y and z per vertex, and edges is a
+    ragged block of the vertex rows of each component's edges.
+    history is an optional force_history.HistoryWriter, which is given
+    its block and time in every time step.
+    Block bodies are collected and parsed together, PARSE_CHUNK bytes at a
+    time, so there are few parse calls however small the blocks are.'''
+    if blocks is None:
+        blocks = list(block_map.keys())
+    stress_blocks = {name.encode('Latin-1'): block_map[name] for name in blocks}
+    vertex_ids = np.empty(0, dtype=np.int64)
+    positions = np.empty((0, 3))
+    edges = _new_block(columns=2)
+    history_block = _new_block()
+    data_dicts = {}
+    tic = perf_counter()
     with zipfile.ZipFile(avz_path) as zfile:
-        with zfile.open('model.avs') as file:
-            is_inside = False
-            positions = {"x": [],
-                         "y": [],
-                         "z": []}
+        size = zfile.getinfo('model.avs').file_size
+        # BufferedReader gives fast line iteration over the inflated stream
+        with io.BufferedReader(zfile.open('model.avs'), 1 << 20) as file:
+            has_vertices = False
+            is_before_timestep = True
             for line in file:
-                nice_line = line.decode('Latin-1').strip()
-                if '}' in nice_line and is_inside:
-                    return positions
+                nice_line = line.strip()
+                if history and nice_line == history.block:
+                    _read_stress_block(file, history_block)
+                elif nice_line in stress_blocks:
+                    data_key = stress_blocks[nice_line]
+                    if data_key not in data_dicts:
+                        data_dicts[data_key] = _new_block()
+                    _read_stress_block(file, data_dicts[data_key])
+                elif nice_line == b'VERTEX_LIST {' and not has_vertices:
+                    vertex_ids, positions = _read_vertex_block(file)
+                    has_vertices = True
+                elif nice_line == b'LINE_LIST {' and is_before_timestep:
+                    _read_line_block(file, edges)
+                elif nice_line == b'TIMESTEP {':
+                    # Geometry is only given before the first time step
+                    is_before_timestep = False
+                    if history:
+                        _add_history(history, history_block)
+                        history.timestep()
+                elif history and nice_line.startswith(b'TIME '):
+                    history.time(float(nice_line.split()[1]))
+    if history:
+        _add_history(history, history_block)
+    for data_key, block in data_dicts.items():
+        data_dicts[data_key] = _ragged_block(block)
+    edges = _edge_block(edges, vertex_ids)
+    seconds = perf_counter() - tic
+    stats = {"megabytes": size / 1e6,
+             "seconds": seconds,
+             "rate": size / 1e6 / seconds if seconds else float('inf')}
+    logging.debug('{}: model.avs parsed, {:.1f} MB at {:.1f} MB/s.'.format(
+        avz_path, stats["megabytes"], stats["rate"]))
+    return {"vertices": positions, "edges": edges, "data": data_dicts,
+            "stats": stats}
+
+
+def _read_vertex_block(file):
+    '''Consume a VERTEX_LIST block from file.
+    Returns array of vertex numbers and array of positions.'''
+    lines = _read_body(file)
+    numbers = _parse_rows(b''.join(lines), len(lines))
+    if numbers is None or numbers.shape[1] < 5:
+        numbers = np.array([[float(number) for number in line.split()[:5]]
+                            for line in lines if line.strip()],
+                           dtype=np.float64).reshape(-1, 5)
+    return numbers[:, 0].astype(np.int64), numbers[:, 2:5]
+
+
+def _read_line_block(file, edges):
+    '''Consume a LINE_LIST block from file into edges, a block from
+    _new_block with two columns. Lines end with the two vertex numbers of
+    an edge, separated by -.'''
+    edges['elements'].append(next(file).split()[-1])
+    next(file)  # To skip LINE_THICKNESS
+    _add_body(edges, [line.replace(b' - ', b' ') for line in _read_body(file)])
+
+
+def _edge_block(edges, vertex_ids):
+    '''Make ragged block of edges collected by _read_line_block, with
+    values of shape (number of edges, 2) holding the rows in the vertex
+    array of both ends.'''
+    block = _ragged_block(edges)
+    pairs = block['values'].astype(np.int64).reshape(-1, 2)
+    if not np.array_equal(vertex_ids, np.arange(len(vertex_ids))):
+        order = np.argsort(vertex_ids, kind='stable')
+        pairs = order[np.searchsorted(vertex_ids, pairs, sorter=order)]
+    return {'id': block['id'], 'values': pairs,
+            'offsets': block['offsets'] // 2}
+
 
-                if is_inside:
-                    data_list = nice_line.split()
-                    positions["x"].append(np.float64(data_list[2]))
-                    positions["y"].append(np.float64(data_list[3]))
-                    positions["z"].append(np.float64(data_list[4]))
-                
-                if "VERTEX_LIST {" == nice_line:
-                    is_inside = True
-    return positions
+def component_geometry(vertices, edges):
+    '''Length, inclination and depth of each component, from vertices
+    and edges of _read_avs. length is the sum of edge lengths [m],
+    inclination is the angle between the horizontal plane and the line
+    from the first to the last vertex [deg], and depth is the depth of the
+    deepest vertex [m]. Returns DataFrame indexed by id.'''
+    pairs = edges['values']
+    starts = edges['offsets'][:-1]
+    ends = edges['offsets'][1:] - 1
+    has_edges = ends >= starts
+    starts = starts[has_edges]
+    ends = ends[has_edges]
+    tails = vertices[pairs[:, 0]]
+    heads = vertices[pairs[:, 1]]
+    edge_lengths = np.sqrt(((heads - tails) ** 2).sum(axis=1))
+    chords = heads[ends] - tails[starts]
+    lowest = np.minimum(tails[:, 2], heads[:, 2])
+    df_geometry = pd.DataFrame({
+        'geo_length': np.add.reduceat(edge_lengths, starts),
+        'inclination': np.degrees(np.arctan2(
+            np.abs(chords[:, 2]), np.hypot(chords[:, 0], chords[:, 1]))),
+        'depth': -np.minimum.reduceat(lowest, starts)
+    }, index=pd.Index(edges['id'][has_edges], name='id'))
+    return df_geometry
+
+
+def _new_block(columns=1):
+    '''Empty block to collect elements into. The last columns numbers
+    of every line of an element are its values. Bodies wait in "bodies"
+    until _parse_pending parses them into "values" and "counts".'''
+    return {'elements': [], 'counts': [], 'values': [], 'columns': columns,
+            'bodies': [], 'num_lines': [], 'size': 0}
+
+
+def _read_body(file):
+    '''Consume the lines of a block from file, up to its closing brace.'''
+    lines = []
+    for line in file:
+        if b'}' in line:
+            break
+        lines.append(line)
+    return lines
+
+
+def _add_body(block, lines):
+    '''Add lines, the body of the last element of block, to be parsed.
+    Pending bodies are parsed when they reach PARSE_CHUNK bytes.'''
+    body = b''.join(lines)
+    block['bodies'].append(body)
+    block['num_lines'].append(len(lines))
+    block['size'] += len(body)
+    if block['size'] >= PARSE_CHUNK:
+        _parse_pending(block)
+
+
+def _read_stress_block(file, block):
+    '''Consume a STRESS_LINE_LIST block from file into block.'''
+    block['elements'].append(next(file).split()[1])
+    _add_body(block, _read_body(file))
+
+
+def _parse_pending(block):
+    '''Parse the pending bodies of block into its values and counts.
+    The bodies are parsed in one call, and one by one only if their lines
+    have different numbers of tokens.'''
+    if not block['bodies']:
+        return
+    columns = block['columns']
+    rows = _parse_rows(b''.join(block['bodies']), sum(block['num_lines']))
+    if rows is not None and rows.shape[1] >= columns:
+        block['values'].append(rows[:, -columns:].ravel())
+        block['counts'].extend(columns * num_lines
+                               for num_lines in block['num_lines'])
+    else:
+        for body in block['bodies']:
+            values = _parse_last_columns(body, columns)
+            block['values'].append(values.ravel())
+            block['counts'].append(values.size)
+    block['bodies'] = []
+    block['num_lines'] = []
+    block['size'] = 0
+
+
+def _add_history(history, block):
+    '''Give history the values of every element collected in block, a
+    time step of history blocks, and empty block.'''
+    _parse_pending(block)
+    values = np.concatenate(block['values'] + [np.empty(0)])
+    splits = np.cumsum(block['counts'])[:-1]
+    for element, element_values in zip(block['elements'],
+                                       np.split(values, splits)):
+        history.add(element, element_values)
+    block.update(_new_block(block['columns']))
+
+
+def _parse_last_columns(body, columns=1):
+    '''Parse the last columns numbers of each line of body into a
+    (lines x columns) array. Blank lines are skipped.'''
+    lines = body.splitlines(keepends=True)
+    numbers = _parse_rows(body, len(lines))
+    if numbers is not None and numbers.shape[1] >= columns:
+        return numbers[:, -columns:]
+    # Ragged lines, read line by line
+    return np.array([[float(number) for number in line.split()[-columns:]]
+                     for line in lines if line.strip()],
+                    dtype=np.float64).reshape(-1, columns)
+
+
+def _parse_rows(body, num_lines):
+    '''Parse body, bytes of num_lines lines of equally many numbers, into
+    a (lines x numbers) array in one call. The tokens of each line are
+    counted over the whole body, between the newline offsets. Returns None
+    if the lines have different numbers of tokens, or no tokens. Raises
+    ValueError for tokens that are not numbers.'''
+    ends = np.flatnonzero(np.frombuffer(body, dtype=np.uint8) == ord('\n'))
+    if not num_lines or len(ends) != num_lines:
+        return None
+    widths = token_counts(body, np.concatenate(([0], ends[:-1] + 1)), ends)
+    width = widths[0]
+    if not width or (widths != width).any():
+        return None
+    numbers = parse_numbers(body, num_lines * width)
+    return numbers.reshape(num_lines, width)
+
+
+def _ragged_block(block):
+    '''Make flat arrays, sorted by element id, from a collected block.
+    Returns a dictionary with "id", "values" and "offsets", where the values
+    of element id[i] are values[offsets[i]:offsets[i+1]]. If an element
+    appears more than once, the last occurrence is kept.'''
+    _parse_pending(block)
+    ids = np.array([int(element) for element in block['elements']],
+                   dtype=np.int64)
+    counts = np.array(block['counts'], dtype=np.int64)
+    values = np.concatenate(block['values'] + [np.empty(0)])
+    starts = np.cumsum(counts) - counts
+    # np.unique points at the first of equal ids, so the ids are reversed
+    # to keep the last occurrence.
+    unique_ids, reverse_pos = np.unique(ids[::-1], return_index=True)
+    order = len(ids) - 1 - reverse_pos
+    counts = counts[order]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    take = np.repeat(starts[order] - offsets[:-1], counts) + np.arange(offsets[-1])
+    return {'id': unique_ids, 'values': values[take], 'offsets': offsets}
+
+
+def _collect_avz_vertices(avz_path):
+    '''Parse vertex positions from file to an array.'''
+    return _read_avs(avz_path, blocks=[])["vertices"]
 
 
 def _collect_avz_edges(avz_path):
-    with zipfile.ZipFile(avz_path) as zfile:
-            with zfile.open('model.avs') as file:
-                is_inside = False
-                edges = {}
-                for line in file:
-                    nice_line = line.decode('Latin-1').strip()
-                    if "TIMESTEP {" == nice_line:
-                        return edges
-
-                    if '}' in nice_line and is_inside:
-                        is_inside = False
-                    
-                    if 'LINE_LIST {' == nice_line:
-                        is_inside = True
-                        ID = str(next(file).decode('Latin-1').strip().split()[-1])
-                        next(file)  # To skip LINE_THICKNESS
-                        edges[ID] = []
-                    
-                    if is_inside:
-                        edge_list = nice_line.split()
-                        edges[ID].append((np.int32(edge_list[-3]),
-                                              np.int32(edge_list[-1])))
-    return edges
+    '''Parse edges of each component from file to a ragged block.'''
+    return _read_avs(avz_path, blocks=[])["edges"]
 
 
 def _collect_avz_data(avz_path, blocks):
     '''Parse data from file to a dictionary.'''
-    with zipfile.ZipFile(avz_path) as zfile:
-        with zfile.open('model.avs') as file:
-            is_inside = False
-            content = []
-            data_dicts = {}
-            data_key = ''
-            for line in file:
-                nice_line = line.decode('Latin-1').strip()
-                for block_name in blocks:
-                    if block_name in nice_line:
-                        is_inside = True
-                        data_key = block_map[block_name]
-                        if data_key not in data_dicts:
-                            data_dicts[data_key] = {}
+    return _read_avs(avz_path, blocks)["data"]
 
-                if '}' in nice_line and is_inside:
-                    is_inside = False
-                    data_dicts[data_key][content[1]] = [np.float64(text.split()[-1]) for text in content[2:]]
-                    content.clear()
 
-                if is_inside:
-                    content.append(nice_line)
-    return data_dicts
+def _segment_arg(block, reduce):
+    '''Position in block values of the first extreme of each element,
+    where reduce is np.maximum or np.minimum. Equal to np.argmax or
+    np.argmin of every element, but in one pass over the values.
+    Elements without values have no extreme and raise ValueError, as
+    np.argmax does; reduceat would give them a value of the next element.'''
+    values = block['values']
+    starts = block['offsets'][:-1]
+    is_empty = block['offsets'][1:] == starts
+    if is_empty.any():
+        raise ValueError('Elements {} have no values.'.format(
+            block['id'][is_empty].tolist()))
+    extreme = reduce.reduceat(values, starts)
+    segment = np.repeat(np.arange(len(starts)), np.diff(block['offsets']))
+    # NaN is picked first, like np.argmax does
+    is_extreme = (values == extreme[segment]) | np.isnan(values)
+    position = np.where(is_extreme, np.arange(len(values)), len(values))
+    return np.minimum.reduceat(position, starts)
 
 
 def _avz_result(data_dicts, return_df_data=False):
-    '''Make DataFrame from data Dictionary. 
+    '''Make DataFrame from ragged data blocks.
     If return_df_data is true, df_data DataFrame is also returned.'''
-    df_data = pd.DataFrame(data_dicts)
-    df_data.reset_index(inplace=True)
-    df_data.set_index(df_data['index'].str.split(expand=True)[1].astype(np.int64),
-                         inplace=True)
-    df_data.sort_index(inplace=True)
     # The following approach may not be correct for membrane or beam.
     # The stress blocks has two columns which are (seemingly) equal for truss.
-    df_data['Forces_argmax'] = df_data.Forces.apply(np.argmax).astype(np.int64)
-    df_data['Z_forces_argmax'] = df_data.Z_forces.apply(np.argmax).astype(np.int64)
-    df_data['Z_forces_argmin'] = df_data.Z_forces.apply(np.argmin).astype(np.int64)
-    df_data['Right_web_argmax'] = df_data.Right_web.apply(np.argmax).astype(np.int64)
-    df_data['Conv_norm_argmax'] = df_data.Conv_norm.apply(np.argmax).astype(np.int64)
-    
-    df_max = pd.DataFrame(index=df_data.index)
+    extremes = {
+        # name: (data key, reduce, index key)
+        'force': ('Forces', np.maximum, 'Force_indices'),
+        'max_zforce': ('Z_forces', np.maximum, 'Z_forces_indices'),
+        'min_zforce': ('Z_forces', np.minimum, 'Z_forces_indices'),
+        'right_web': ('Right_web', np.maximum, 'Right_web_indices'),
+        'conv_norm': ('Conv_norm', np.maximum, 'Conv_norm_indices')
+    }
+    positions = {name: _segment_arg(data_dicts[data_key], reduce)
+                 for name, (data_key, reduce, _) in extremes.items()}
+    values = {name: pd.Series(data_dicts[data_key]['values'][positions[name]],
+                              index=data_dicts[data_key]['id'])
+              for name, (data_key, _, _) in extremes.items()}
+
+    df_max = pd.DataFrame(index=values['force'].index)
     df_max.index.name = 'id'
-    df_max['force'] = df_data.apply(lambda row: row['Forces'][row['Forces_argmax']], axis=1)
+    df_max['force'] = values['force']
     df_max['load'] = df_max['force'] / (g * 1000)
-    df_max['max_zforce'] = df_data.apply(lambda row: row['Z_forces'][row['Z_forces_argmax']], axis=1)
-    df_max['min_zforce'] = df_data.apply(lambda row: row['Z_forces'][row['Z_forces_argmin']], axis=1)
-    df_max['max_zload'] = df_data.apply(lambda row: row['Z_forces'][row['Z_forces_argmax']], axis=1) / (g * 1000)
-    df_max['min_zload'] = df_data.apply(lambda row: row['Z_forces'][row['Z_forces_argmin']], axis=1) / (g * 1000)
-    df_max['right_web'] = df_data.apply(lambda row: row['Right_web'][row['Right_web_argmax']], axis=1)
-    df_max['conv_norm'] = df_data.apply(lambda row: row['Conv_norm'][row['Conv_norm_argmax']], axis=1)
-    
+    df_max['max_zforce'] = values['max_zforce']
+    df_max['min_zforce'] = values['min_zforce']
+    df_max['max_zload'] = values['max_zforce'] / (g * 1000)
+    df_max['min_zload'] = values['min_zforce'] / (g * 1000)
+    df_max['right_web'] = values['right_web']
+    df_max['conv_norm'] = values['conv_norm']
+
     if 'Force_indices' in data_dicts.keys(): # Enough to only check for Force_indices
-        df_max['force_index'] = df_data.apply(lambda row: row['Force_indices'][row['Forces_argmax']], axis=1).astype(np.int64)
-        df_max['max_zload_index'] = df_data.apply(lambda row: row['Z_forces_indices'][row['Z_forces_argmax']], axis=1).astype(np.int64)
-        df_max['min_zload_index'] = df_data.apply(lambda row: row['Z_forces_indices'][row['Z_forces_argmin']], axis=1).astype(np.int64)
-        df_max['right_web_index'] = df_data.apply(lambda row: row['Right_web_indices'][row['Right_web_argmax']], axis=1).astype(np.int64)
-        df_max['conv_norm_index'] = df_data.apply(lambda row: row['Conv_norm_indices'][row['Conv_norm_argmax']], axis=1).astype(np.int64)
-    
+        index_cols = {'force': 'force_index',
+                      'max_zforce': 'max_zload_index',
+                      'min_zforce': 'min_zload_index',
+                      'right_web': 'right_web_index',
+                      'conv_norm': 'conv_norm_index'}
+        for name, index_col in index_cols.items():
+            data_key, _, index_key = extremes[name]
+            # Index blocks have the same layout as their data blocks
+            local = positions[name] - data_dicts[data_key]['offsets'][:-1]
+            index_block = data_dicts[index_key]
+            df_max[index_col] = pd.Series(
+                index_block['values'][index_block['offsets'][:-1] + local],
+                index=index_block['id']
+            ).astype(np.int64)
+
     if return_df_data:
+        df_data = pd.DataFrame({
+            data_key: pd.Series(np.split(block['values'], block['offsets'][1:-1]),
+                                index=block['id'])
+            for data_key, block in data_dicts.items()
+        })
+        for name, (data_key, reduce, _) in extremes.items():
+            suffix = '_argmin' if reduce is np.minimum else '_argmax'
+            df_data[data_key + suffix] = (
+                positions[name] - data_dicts[data_key]['offsets'][:-1]
+            )
         return df_max, df_data
     else:
         return df_max
 
 
-def avz_to_df(avz_path, is_accident, is_nice=False):
-    '''Get a complete DataFrame from .avz-file.'''
-    blocks = list(block_map.keys())
-    data_dicts = _collect_avz_data(avz_path, blocks)
+def avz_to_df(avz_path, is_accident, is_nice=False, avs=None):
+    '''Get a complete DataFrame from .avz-file.
+    avs is the output of _read_avs, if model.avs is already parsed.'''
+    if avs is None:
+        avs = _read_avs(avz_path)
+    data_dicts = avs["data"]
     df_model = _model(avz_path, is_accident, is_nice)
     df_result = _avz_result(data_dicts)
     df_result['utilization'] = df_result['load'] * 100 / df_model['load_limit']
@@ -211,6 +438,8 @@ def avz_to_df(avz_path, is_accident, is_nice=False):
         df_result['mbl_anchor'] = df_result['force'] * ((1.15 * 3) / (g * 1000))
         df_result['mbl_shackle'] = df_result['force'] * ((1.15 * 2) / (g * 1000))
         df_result['mbl_coupling'] = df_result['force'] * ((1.15 * 1.5) / (g * 1000))
+    df_geometry = component_geometry(avs["vertices"], avs["edges"])
+    df_result = df_result.join(df_geometry)
     return pd.merge(df_model, df_result, left_index=True, right_index=True)
 
 
@@ -1,30 +1,162 @@
+import re
 import sys
+import numpy as np
 import pandas as pd
 from scipy.constants import g
+from amoor.util import parse_numbers, token_counts
 
+MASS_CENTRE_BLOCK = 'Mass centre beams and trusses'
+_ROW_WORD = b'Component'
+# What a row is. _line_table classifies lines by this rule, with numpy
+_row_pat = re.compile(rb'^[ \t]*Component[ \t]+\d', re.MULTILINE)
 
-def key_to_df(key_path):
+
+class KeyFile:
+    '''Blocks of a key.txt-file. The file is read in one go, and a block
+    is only parsed the first time it is asked for. Rows are the lines
+    starting with Component and an id, and the other lines with text are
+    titles, naming the block of rows below them. Blocks are looked up by a
+    part of their title, so decorated titles like
+    "Mass centre beams and trusses [m]" are found too.'''
+
+    def __init__(self, key_path):
+        with open(key_path, 'rb') as file:
+            self.text = file.read()
+        self.starts, self.ends, self.is_row = _line_table(self.text)
+        is_title = ~self.is_row & (self.ends > self.starts)
+        titles = np.flatnonzero(is_title)
+        # Whitespace lines are not titles
+        titles = [line for line in titles
+                  if self.text[self.starts[line]:self.ends[line]].strip()]
+        self.names = [self.text[self.starts[line]:self.ends[line]]
+                      .strip().decode('Latin-1') for line in titles]
+        self.spans = list(zip(titles, titles[1:] + [len(self.starts)]))
+        self.numbers = None
+        self.num_tokens = None
+        self.blocks = {}
+
+    def block(self, name, width=None):
+        '''Rows of the blocks with name in their title, as id array and
+        (rows x values) float array. If width is given, rows with another
+        number of values are left out, otherwise rows with the most common
+        number of values are kept.'''
+        if (name, width) not in self.blocks:
+            parts = [self._parse(first, stop, width)
+                     for (first, stop), title in zip(self.spans, self.names)
+                     if name in title]
+            self.blocks[(name, width)] = _join(parts, width)
+        return self.blocks[(name, width)]
+
+    def rows_before(self, name, width=None):
+        '''Rows of all blocks before the first block with name in its
+        title, as in block.'''
+        stops = [first for (first, _), title in zip(self.spans, self.names)
+                 if name in title]
+        return self._parse(0, stops[0] if stops else len(self.starts), width)
+
+    def mass_centres(self):
+        '''Mass centre of each component. Returns DataFrame indexed by id
+        with columns x, y and z.'''
+        ids, values = self.block(MASS_CENTRE_BLOCK)
+        if not len(ids):
+            values = np.empty((0, 3))
+        df_centres = pd.DataFrame(values[:, :3], columns=['x', 'y', 'z'],
+                                  index=pd.Index(ids, name='id'))
+        return df_centres
+
+    def _parse(self, first, stop, width=None):
+        '''Parse rows of lines first to stop. Only rows with width values,
+        or the most common number of values if width is None, are kept,
+        and they are parsed in one call. Returns id array and
+        (rows x values) float array.'''
+        if self.numbers is None:
+            # Rows without the word Component, and titles blanked out
+            text = bytearray(self.text)
+            for line in np.flatnonzero(~self.is_row):
+                start, end = self.starts[line], self.ends[line]
+                text[start:end] = b' ' * (end - start)
+            self.numbers = bytes(text).replace(b'Component', b' ' * 9)
+            self.num_tokens = token_counts(self.numbers, self.starts,
+                                            self.ends)
+        rows = first + np.flatnonzero(self.is_row[first:stop])
+        if not len(rows):
+            return _join([], width)
+        num_tokens = self.num_tokens[rows]
+        if width is None:
+            width = np.bincount(num_tokens).argmax() - 1
+        rows = rows[num_tokens == width + 1]
+        if not len(rows):
+            return _join([], width)
+        if np.count_nonzero(self.is_row[rows[0]:rows[-1] + 1]) == len(rows):
+            # No left out rows in between, the lines are parsed as they lie
+            body = self.numbers[self.starts[rows[0]]:self.ends[rows[-1]]]
+        else:
+            body = b'\n'.join(self.numbers[start:end] for start, end
+                              in zip(self.starts[rows], self.ends[rows]))
+        numbers = parse_numbers(body, len(rows) * (width + 1))
+        numbers = numbers.reshape(len(rows), width + 1)
+        return numbers[:, 0].astype(np.int64), numbers[:, 1:]
+
+
+def _line_table(text):
+    '''Start and end of every line in text, and whether it is a row.
+    A row matches _row_pat: its first token is Component, followed by
+    spaces or tabs and a digit. All lines are classified together, from
+    the first two token starts of each line.'''
+    codes = np.frombuffer(text, dtype=np.uint8)
+    ends = np.flatnonzero(codes == ord('\n'))
+    if len(codes) and codes[-1] != ord('\n'):
+        ends = np.append(ends, len(codes))
+    starts = np.concatenate(([0], ends[:-1] + 1))[:len(ends)].astype(np.int64)
+    is_blank = (codes == ord(' ')) | (codes == ord('\t'))
+    is_space = is_blank | ((codes >= 9) & (codes <= 13))
+    is_token_start = ~is_space
+    is_token_start[1:] &= is_space[:-1]
+    token_starts = np.append(np.flatnonzero(is_token_start),
+                             [len(codes), len(codes)])
+    first = np.searchsorted(token_starts, starts)
+    heads = token_starts[first]
+    seconds = token_starts[first + 1]
+    # Only spaces and tabs may come before the second token
+    others = np.flatnonzero(is_space & ~is_blank)
+    word = np.frombuffer(_ROW_WORD, dtype=np.uint8)
+    padded = np.concatenate((codes, np.zeros(len(word) + 1, dtype=np.uint8)))
+    head_codes = padded[heads[:, None] + np.arange(len(word) + 1)]
+    second_codes = padded[seconds]
+    is_row = ((seconds < ends)
+              & (np.searchsorted(others, seconds)
+                 == np.searchsorted(others, starts))
+              & (head_codes[:, :-1] == word).all(axis=1)
+              & ((head_codes[:, -1] == ord(' '))
+                 | (head_codes[:, -1] == ord('\t')))
+              & (second_codes >= ord('0')) & (second_codes <= ord('9')))
+    return starts, ends, is_row
+
+
+def _join(parts, width=None):
+    '''Join parsed rows of several blocks.'''
+    if not parts:
+        return (np.empty(0, dtype=np.int64),
+                np.empty((0, 0 if width is None else width)))
+    return (np.concatenate([ids for ids, _ in parts]),
+            np.concatenate([values for _, values in parts]))
+
+
+def key_to_df(key_path, key_file=None):
     '''Reads relevant data from key.txt-file.
     mass_w   ==> effective mass in water [kg]
     mass     ==> mass [kg]
     bouyancy ==> bouyancy [kg]
-    length   ==> length [m]'''
-    with open(key_path, 'r') as file:
-        header = ['id', 'mass_w', 'mass', 'boyancy', 'length']
-        lines = {name: [] for name in header}
-        for line in file:
-            if ' Mass centre beams and trusses ' in line:
-                # To stop after first block is read
-                break
-            if 'Component' in line:
-                data = line.split()
-                if len(data) == 6:
-                    lines[header[0]].append(int(data[1]))
-                    lines[header[-1]].append(float(data[-1]))
-                    for i in range(1, len(header)-1):
-                        lines[header[i]].append(float(data[i+1])/g)
-    df_key = pd.DataFrame(lines)
-    df_key.set_index('id', inplace=True)
+    length   ==> length [m]
+    key_file is a KeyFile of key_path, if it is already read.'''
+    if key_file is None:
+        key_file = KeyFile(key_path)
+    ids, values = key_file.rows_before(MASS_CENTRE_BLOCK, width=4)
+    df_key = pd.DataFrame({'mass_w': values[:, 0] / g,
+                           'mass': values[:, 1] / g,
+                           'boyancy': values[:, 2] / g,
+                           'length': values[:, 3]},
+                          index=pd.Index(ids, name='id'))
     return df_key
 
 
@@ -0,0 +1,237 @@
+"""
+Synthetic inputs for benchmarks and experiments.
+
+write_avz writes an .avz-archive shaped like the PFAT results of a
+mooring analysis. It holds model.xml, with environment loads and
+components, and model.avs, with the geometry, the axial force of every
+element in every time step, and the maximum and index blocks that
+read_avz parses. write_key writes the matching key.txt-file, and
+write_olex an Olex object export with any number of mooring lines. The
+values come from a seeded generator, so the same arguments give the same
+files.
+"""
+import io
+import gzip
+import zipfile
+import numpy as np
+from pathlib import Path
+from scipy.constants import g
+
+# Material and its MBL [tonn] for each segment. The materials are in
+# all_materials.csv
+SEGMENTS = {
+    'Bunnkjetting': ('32 AlKj', 104.9),
+    'Tau': ('56 GS-3', 61.4),
+    'Toppkjetting': ('28 AlKj', 80.4),
+    'Ramme': ('48 GS-3', 45.1),
+    'Hanefot': ('40 GS-3', 31.4)
+}
+MAX_BLOCKS = {
+    'Local_section_forces.Max_axial_force_[N]': 'force',
+    'Global_section_forces.Max_force_Z_[N]': 'z_force',
+    'Nominal_stress_range.Right_web_[MPa]': 'right_web',
+    'Convergence_norm': 'conv_norm'
+}
+HISTORY_BLOCK = 'Local_section_forces.Axial_force_[N]'
+ORIGIN = (4208.0, 1399.8)  # Latitude and longitude of Olex lines [min]
+
+
+def _model_xml(rng, ids, num_loads):
+    '''model.xml of components with ids, and num_loads environment loads.
+    Components are numbered by line, each line having all SEGMENTS, as
+    101_Bunnkjetting: 32 AlKj, 101_Tau: 56 GS-3 and so on.'''
+    lines = ['<?xml version="1.0" encoding="ISO-8859-1"?>', '<model>',
+             '<EnvironmentLoads>']
+    for load in range(num_loads):
+        lines.append(
+            '<load waveamplitude="{:.3f}" waveperiod="{:.3f}" '
+            'waveangle="{:.1f}" wavetype="1" currentx="0.0" currenty="0.0" '
+            'windx="{:.3f}" windy="{:.3f}" group="{}" type="fixed">'
+            '<currents><current velocity="{:.3f}" direction="{:.1f}"/>'
+            '<current velocity="{:.3f}" direction="{:.1f}"/></currents>'
+            '</load>'.format(
+                rng.uniform(0.5, 2.5), rng.uniform(3, 8), rng.uniform(0, 360),
+                rng.normal(0, 10), rng.normal(0, 10), load + 1,
+                rng.uniform(0.2, 0.8), rng.uniform(0, 360),
+                rng.uniform(0.1, 0.4), rng.uniform(0, 360)))
+    lines.append('</EnvironmentLoads>')
+    lines.append('<Components>')
+    segments = list(SEGMENTS)
+    for number, component_id in enumerate(ids):
+        segment = segments[number % len(segments)]
+        material, mbl = SEGMENTS[segment]
+        lines.append(
+            '<component id="{}" number="{}" name="{}_{}: {}" '
+            'materialcoeff="{}" breakingload="{:.1f}"/>'.format(
+                component_id, component_id + 1000,
+                101 + number // len(segments), segment,
+                material, (1.5, 1.6, 1.7)[number % 3], mbl * g * 1000))
+    lines.append('</Components>')
+    lines.append('</model>')
+    return '\n'.join(lines)
+
+
+def _geometry(num_components, model_seed):
+    '''Shuffled component ids 1 to num_components, and the start and end
+    of each component. Components are straight lines, from an anchor at
+    the bottom towards the frame.'''
+    rng = np.random.default_rng(model_seed)
+    ids = rng.permutation(np.arange(1, num_components + 1))
+    starts = np.column_stack((rng.uniform(-500, 500, (num_components, 2)),
+                              -rng.uniform(20, 120, num_components)))
+    ends = starts + np.column_stack((rng.uniform(-200, 200,
+                                                 (num_components, 2)),
+                                     rng.uniform(5, 40, num_components)))
+    return ids, starts, ends
+
+
+def _blocks(name, ids, values):
+    '''STRESS_LINE_LIST blocks of name, one per component in ids, with a
+    row for each element in values, (components x elements).'''
+    head = 'STRESS_LINE_LIST:' + name + ' {\nELEMENT '
+    rows = np.arange(values.shape[1])
+    return ''.join(
+        head + str(component_id) + '\n'
+        + ''.join('{} {:.6e} {:.6e}\n'.format(row, value, value)
+                  for row, value in zip(rows, component_values))
+        + '}\n'
+        for component_id, component_values in zip(ids, values.tolist()))
+
+
+def write_avz(path, num_components=1000, num_elements=4, num_timesteps=20,
+              num_loads=8, seed=0, model_seed=0):
+    '''Write synthetic .avz-file to path, with num_components components
+    of num_elements elements each, and num_timesteps time steps.
+    Component ids are 1 to num_components, shuffled. The model is made
+    from model_seed and the loads from seed, so load cases of one model
+    have the same model_seed and different seeds.'''
+    rng = np.random.default_rng(seed)
+    ids, starts, ends = _geometry(num_components, model_seed)
+    fractions = np.linspace(0, 1, num_elements + 1)
+    vertices = (starts[:, None, :]
+                + fractions[None, :, None] * (ends - starts)[:, None, :])
+    vertices = vertices.reshape(-1, 3)
+    first_vertex = np.arange(num_components) * (num_elements + 1)
+    # Axial force [N] of every element, a swell period on a pretension
+    pretension = rng.uniform(1e4, 1e5, (num_components, 1))
+    amplitude = rng.uniform(0.1, 0.6, (num_components, 1)) * pretension
+    phase = rng.uniform(0, 2 * np.pi, (num_components, 1))
+    element_shift = np.linspace(0, 0.2, num_elements)[None, :]
+    steps = np.arange(num_timesteps)
+    forces = [pretension + amplitude * np.sin(2 * np.pi * step / 12 + phase
+                                              + element_shift)
+              for step in steps]
+    forces = np.stack(forces)  # (time steps x components x elements)
+    max_values = {
+        'force': forces.max(axis=0),
+        'z_force': 0.3 * forces.max(axis=0),
+        'right_web': (forces.max(axis=0) - forces.min(axis=0)) / 2e3,
+        'conv_norm': rng.uniform(0, 1e-3, forces.shape[1:])
+    }
+    max_indices = {'force': forces.argmax(axis=0),
+                   'z_force': forces.argmax(axis=0),
+                   'right_web': forces.argmax(axis=0),
+                   'conv_norm': rng.integers(0, num_timesteps,
+                                             forces.shape[1:])}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zfile:
+        zfile.writestr('model.xml', _model_xml(rng, ids, num_loads)
+                       .encode('Latin-1'))
+        with zfile.open('model.avs', 'w', force_zip64=True) as raw:
+            file = io.TextIOWrapper(raw, encoding='Latin-1', newline='\n')
+            file.write('VERTEX_LIST {\n')
+            file.writelines('{} 0 {:.4f} {:.4f} {:.4f}\n'.format(number, *pos)
+                            for number, pos in enumerate(vertices.tolist()))
+            file.write('}\n')
+            for component_id, first in zip(ids.tolist(), first_vertex):
+                file.write('LINE_LIST {{\nCOMPONENT {}\nLINE_THICKNESS 1\n'
+                           .format(component_id))
+                file.writelines('{} - {}\n'.format(vertex, vertex + 1)
+                                for vertex in range(first,
+                                                    first + num_elements))
+                file.write('}\n')
+            for step in steps:
+                file.write('TIMESTEP {{\nTIME {:.1f}\n'.format(step * 0.5))
+                file.write(_blocks(HISTORY_BLOCK, ids, forces[step]))
+                file.write('}\n')
+            for name, key in MAX_BLOCKS.items():
+                file.write(_blocks(name, ids, max_values[key]))
+                file.write(_blocks(name + '_INDEX', ids,
+                                   max_indices[key].astype(np.float64)))
+            file.flush()
+            file.detach()
+
+
+def write_key(path, num_components=1000, model_seed=0):
+    '''Write synthetic key.txt-file to path, matching the components of
+    write_avz with the same num_components and model_seed.'''
+    rng = np.random.default_rng(model_seed + 1)
+    ids, starts, ends = _geometry(num_components, model_seed)
+    length = np.sqrt(((ends - starts) ** 2).sum(axis=1))
+    mass = length * rng.uniform(5, 60, num_components) * g
+    buoyancy = 0.13 * mass
+    centres = (starts + ends) / 2
+    # Titles have a space on both sides, as in the files of the analysis
+    lines = ['Key file of synthetic model', '', ' Component masses ']
+    lines += ['Component {} {:.4f} {:.4f} {:.4f} {:.4f}'.format(
+                  component_id, m - b, m, b, l)
+              for component_id, m, b, l in zip(ids, mass, buoyancy, length)]
+    lines += ['', ' Mass centre beams and trusses ']
+    lines += ['Component {} {:.3f} {:.3f} {:.3f}'.format(component_id, *c)
+              for component_id, c in zip(ids, centres.tolist())]
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def write_olex(path, num_lines=1000, dirty=False, seed=0):
+    '''Write synthetic Olex object export to path, gzipped, with
+    num_lines named mooring lines from frame corners to anchors. If dirty
+    is True, some lines have the anchor first and some single points are
+    added, as in a real export.'''
+    rng = np.random.default_rng(seed)
+    num_corners = max(1, num_lines // 4)
+    corners = np.column_stack((
+        ORIGIN[0] + rng.uniform(-0.3, 0.3, num_corners),
+        ORIGIN[1] + rng.uniform(-0.6, 0.6, num_corners)))
+    corner = rng.integers(0, num_corners, num_lines)
+    # About 300 m to the anchor, 1' of latitude is 1852 m
+    distance = rng.uniform(200, 400, num_lines) / 1852
+    azimuth = rng.uniform(0, 2 * np.pi, num_lines)
+    latitude = np.radians(corners[corner, 0] / 60)
+    anchors = np.column_stack((
+        corners[corner, 0] + distance * np.cos(azimuth),
+        corners[corner, 1] + distance * np.sin(azimuth) / np.cos(latitude)))
+    is_swapped = dirty & (rng.random(num_lines) < 0.2)
+    timestamp = 1571035118
+    blocks = ['Ferdig forenklet\n']
+    for line in range(num_lines):
+        frame = '{:.7f} {:.7f} {} Brunsirkel'.format(
+            *corners[corner[line]], timestamp)
+        anchor = '{:.7f} {:.7f} {} Anker'.format(*anchors[line], timestamp)
+        points = [anchor, frame] if is_swapped[line] else [frame, anchor]
+        blocks.append('Rute uten navn\nLinjefarge Gul\nPlottsett 8\n'
+                      '{}\n{}\nNavn F{}\n'.format(*points, line + 1))
+        if dirty and line % 10 == 0:
+            blocks.append('Rute uten navn\nLinjefarge Gul\nPlottsett 8\n'
+                          '{:.7f} {:.7f} {} Kryss\n'.format(
+                              *anchors[line], timestamp))
+    with gzip.open(path, 'wt', encoding='cp1252', newline='\n') as file:
+        file.write('\n'.join(blocks) + '\n')
+
+
+def write_tree(root, num_loads=3, num_components=1000, num_elements=4,
+               num_timesteps=20, model_seed=0):
+    '''Write result tree for handler.py under root, Resultater/Site with
+    num_loads PFAT .avz-files and key.txt-files of one model in each of
+    Intakt and Ulykke. Returns the Resultater path.'''
+    source = Path(root) / 'Resultater'
+    for number, folder in enumerate(['Intakt', 'Ulykke']):
+        folder_path = source / 'Site' / folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+        for lt in range(1, num_loads + 1):
+            stem = 'Site{}{:03d}'.format(folder, lt)
+            write_avz(folder_path / (stem + 'PFAT.avz'), num_components,
+                      num_elements, num_timesteps,
+                      seed=100 * number + lt, model_seed=model_seed)
+            write_key(folder_path / (stem + 'key.txt'), num_components,
+                      model_seed)
+    return source
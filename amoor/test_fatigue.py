@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from amoor import fatigue
+
+
+def _rainflow_cycles(values):
+    '''Ranges and counts of values by the three point method, one point at
+    a time, as reference.'''
+    points = []
+    for value in values:
+        if np.isnan(value) or (points and value == points[-1]):
+            continue
+        if (len(points) >= 2
+                and (value - points[-1]) * (points[-1] - points[-2]) > 0):
+            points[-1] = value
+        else:
+            points.append(value)
+    cycles = []
+    stack = []
+    for point in points:
+        stack.append(point)
+        while len(stack) >= 3:
+            x_range = abs(stack[-1] - stack[-2])
+            y_range = abs(stack[-2] - stack[-3])
+            if x_range < y_range:
+                break
+            if len(stack) == 3:
+                cycles.append((y_range, 0.5))
+                stack.pop(0)
+            else:
+                cycles.append((y_range, 1.0))
+                del stack[-3:-1]
+    cycles += [(abs(b - a), 0.5) for a, b in zip(stack[:-1], stack[1:])]
+    return cycles
+
+
+def _reference_damage(values, curve=fatigue.SN_CURVE_D):
+    return sum(count * fatigue.cycle_damage([y_range], curve)[0]
+               for y_range, count in _rainflow_cycles(values))
+
+
+def test_rainflow_matches_reference():
+    rng = np.random.default_rng(0)
+    histories = rng.normal(0, 40, (50, 200)).round()
+    histories[3, 10:20] = np.nan
+    histories[4] = 7.0
+    histories[5, :] = np.sin(np.arange(200) / 5) * 100
+    damage = fatigue.rainflow_damage(histories, chunk=16)
+    expected = [_reference_damage(row) for row in histories]
+    assert np.allclose(damage, expected, rtol=1e-12, atol=0)
+    assert damage[4] == 0
+
+
+def test_rainflow_astm_example():
+    # ASTM E1049 figure 6: 0.5 cycles of 3, 1.5 of 4, 0.5 of 6, 1.0 of 8
+    # and 0.5 of 9
+    cycles = _rainflow_cycles([-2, 1, -3, 5, -1, 3, -4, 4, -2])
+    assert sorted(cycles) == [(3, 0.5), (4, 0.5), (4, 1.0), (6, 0.5),
+                              (8, 0.5), (8, 0.5), (9, 0.5)]
+    curve = {'m1': 3.0, 'log_a1': 0.0, 'm2': None}
+    damage = fatigue.rainflow_damage(
+        np.array([-2, 1, -3, 5, -1, 3, -4, 4, -2.0]), curve)
+    expected = 0.5 * (27 + 64 + 216 + 512 + 512 + 729) + 64
+    assert np.isclose(damage[0], expected)
+
+
+def test_fatigue_table_of_missing_ids():
+    result = pd.DataFrame({'id': [1, 2], 'component': ['a', 'b'],
+                           'segment': ['Tau', 'Tau'],
+                           'material': ['m', 'm'], 'right_web': [1.0, 2.0]})
+    damage = pd.Series([0.1, 0.5], index=pd.Index([2, 3], name='id'))
+    table = fatigue.fatigue_table(damage, result)
+    assert table.index.tolist() == [3, 2]
+    assert table['life'].tolist() == [2, 10]
+    assert table['component'].isna().tolist() == [True, False]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from amoor import force_history, synthetic
+
+
+def test_history_window_by_time(tmp_path):
+    avz_path = tmp_path / 'PFAT.avz'
+    synthetic.write_avz(avz_path, 10, num_elements=2, num_timesteps=6)
+    history = force_history.extract(avz_path, tmp_path / 'history.npy')
+    assert history.forces.shape == (10, 6)
+    # Time steps are 0.5 s apart
+    assert history.times.tolist() == [0, 0.5, 1, 1.5, 2, 2.5]
+    assert history.window(1.0, 2.0).shape == (10, 2)
+    element_id = int(history.ids[3])
+    assert np.array_equal(history.element(element_id, 1.0, 2.0),
+                          history.forces[3, 2:4])
+    assert np.array_equal(history.window(element_ids=[element_id])[0],
+                          history.forces[3])
+
+
+def test_writer_skips_elements_outside_first_step(tmp_path):
+    writer = force_history.HistoryWriter(tmp_path / 'history.npy')
+    for step, time in enumerate([10.0, 10.5]):
+        writer.timestep()
+        writer.time(time)
+        writer.add(b'1', np.array([1.0, step + 2.0]))
+        if step:
+            writer.add(b'2', np.array([5.0]))
+    writer.close()
+    history = force_history.ForceHistory(tmp_path / 'history.npy')
+    assert history.ids.tolist() == [1]
+    assert history.forces.tolist() == [[2, 3]]
+    assert history.window(10.5).tolist() == [[3]]
+
+
+def _failing_read(path, blocks=None, history=None):
+    '''Parse of a file that breaks off after two time steps.'''
+    for step in range(2):
+        history.timestep()
+        history.time(step * 0.5)
+        history.add(b'1', np.array([1.0, 2.0]))
+    raise ValueError('Truncated file')
+
+
+def test_failed_extract_writes_no_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(force_history.read_avz, '_read_avs', _failing_read)
+    with pytest.raises(ValueError):
+        force_history.extract(tmp_path / 'PFAT.avz', tmp_path / 'history.npy')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_pfat_parse_writes_no_history(tmp_path, monkeypatch):
+    import handler
+    monkeypatch.setattr(handler.read_avz, '_read_avs', _failing_read)
+    pfat_csv = tmp_path / 'PFAT.feather'
+    with pytest.raises(ValueError):
+        handler.parse_pfat(tmp_path / 'PFAT.avz', pfat_csv, history=True)
+    assert list(tmp_path.iterdir()) == []
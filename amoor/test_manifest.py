@@ -0,0 +1,48 @@
+import handler
+from amoor import manifest, force_history
+
+
+def _tree(tmp_path):
+    source = tmp_path / 'PFAT.avz'
+    output = tmp_path / 'PFAT.csv'
+    source.write_bytes(b'results')
+    output.write_text('parsed')
+    return source, output
+
+
+def test_needs_build_when_input_changes(tmp_path):
+    source, output = _tree(tmp_path)
+    build_manifest = manifest.Manifest(tmp_path / 'manifest.json')
+    assert build_manifest.needs_build(output, [source])
+    build_manifest.record(output, [source])
+    build_manifest.save()
+    build_manifest = manifest.Manifest(tmp_path / 'manifest.json')
+    assert not build_manifest.needs_build(output, [source])
+    source.write_bytes(b'new results')
+    build_manifest.forget(source)
+    assert build_manifest.needs_build(output, [source])
+
+
+def test_needs_build_when_output_missing_or_stale(tmp_path):
+    source, output = _tree(tmp_path)
+    build_manifest = manifest.Manifest(tmp_path / 'manifest.json')
+    build_manifest.record(output, [source])
+    assert build_manifest.needs_build(output, [source], {str(source)})
+    output.unlink()
+    assert build_manifest.needs_build(output, [source])
+
+
+def test_missing_history_schedules_parse(tmp_path):
+    source, output = _tree(tmp_path)
+    history = force_history.history_path(output)
+    build_manifest = manifest.Manifest(tmp_path / 'manifest.json')
+    build_manifest.record(output, [source])
+    tasks = [([output], [source], print, ()),
+             ([output, history], [source], print, ())]
+    stale = set()
+    assert handler._schedule(build_manifest, tasks, stale, False) == tasks[1:]
+    assert handler._schedule(build_manifest, tasks, stale, True) == []
+    assert stale == {str(output), str(history)}
+    history.write_bytes(b'history')
+    build_manifest.record(history, [source])
+    assert handler._schedule(build_manifest, tasks, set(), False) == []
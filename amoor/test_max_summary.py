@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from amoor import max_summary
+
+COLUMNS = ['force', 'load', 'load_limit', 'right_web', 'conv_norm',
+           'mbl_bound', 'mbl_anchor', 'mbl_shackle', 'mbl_coupling', 'mbl',
+           'length', 'mass', 'materialcoeff', 'max_zforce', 'min_zforce']
+
+
+def _write_results(folder, utilizations, max_zloads):
+    '''One merged result per load case, with ids 1 to 3.'''
+    paths = []
+    for lt, (utilization, max_zload) in enumerate(
+            zip(utilizations, max_zloads), 1):
+        df = pd.DataFrame({column: [10.0 * lt] * 3 for column in COLUMNS},
+                          index=pd.Index([1, 2, 3], name='id'))
+        df['utilization'] = utilization
+        df['max_zload'] = max_zload
+        df['min_zload'] = [-1.0 * lt] * 3
+        df['material'] = 'lt{}'.format(lt)
+        df['component'] = 'c'
+        df['segment'] = 'Tau'
+        df['is_accident'] = False
+        path = folder / 'Site{:03d}merged.csv'.format(lt)
+        df.to_csv(path)
+        paths.append(path)
+    return paths
+
+
+def test_summarize_keeps_first_of_ties_and_skips_nan(tmp_path):
+    paths = _write_results(tmp_path, [[0.5, 0.7, np.nan],
+                                      [0.6, 0.7, 0.9],
+                                      [0.4, 0.8, np.nan]],
+                           [[1, 2, 3], [1, 5, 2], [0, 5, 9]])
+    df = max_summary.summarize(paths)
+    assert df['utilization'].tolist()[:2] == [0.6, 0.8]
+    assert np.isnan(df.loc[3, 'utilization'])
+    # Dependent columns follow their criterion
+    assert df['material'].tolist() == ['lt2', 'lt3', 'lt1']
+    assert df['force'].tolist() == [20, 30, 10]
+    assert df['force_lt'].tolist() == [2, 3, 1]
+    assert df['max_zload'].tolist() == [1, 5, 9]
+    assert df['max_zforce'].tolist() == [10, 20, 30]
+    assert df['max_zload_lt'].tolist() == [1, 2, 3]
+    assert df['min_zload_lt'].tolist() == [1, 1, 1]
+
+
+def test_read_ahead_stops_with_consumer(tmp_path):
+    paths = _write_results(tmp_path, [[0.1] * 3] * 4, [[1] * 3] * 4)
+    threads = threading.active_count()
+    results = max_summary._read_ahead(paths)
+    ref, df = next(results)
+    assert ref.name == paths[0].name and len(df) == 3
+    results.close()
+    assert threading.active_count() == threads
+
+
+def test_read_ahead_raises_read_errors(tmp_path):
+    paths = _write_results(tmp_path, [[0.1] * 3], [[1] * 3])
+    results = max_summary._read_ahead(paths + [tmp_path / 'missing.csv'])
+    next(results)
+    with pytest.raises(FileNotFoundError):
+        next(results)
+
+
+def test_lt_of_missing_source_is_nan():
+    df = pd.DataFrame({'force_source': ['Site002merged.csv', None,
+                                        'Site010merged.feather']})
+    lts = max_summary.add_lt_columns(df)['force_lt']
+    assert lts[[0, 2]].tolist() == [2, 10]
+    assert np.isnan(lts[1])
+    # LTs stay integers when every source is present
+    lts = max_summary.add_lt_columns(df.loc[[0, 2]])['force_lt']
+    assert lts.dtype == np.int64
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from amoor import olutil, synthetic
+
+
+def _surveyed(tmp_path, num_lines=40):
+    path = tmp_path / 'olex.gz'
+    synthetic.write_olex(path, num_lines, dirty=True)
+    data = olutil._read_olex_object_export(path)
+    return path, olutil._make_olex_df(data, True, formatted=False)
+
+
+def test_match_anchors_finds_nearest_point(tmp_path):
+    path, surveyed = _surveyed(tmp_path)
+    origin_lat, origin_long = surveyed[['latitude', 'longitude']].mean()
+    # Design anchors a few metres from surveyed ones, and random points
+    picked = surveyed.iloc[[0, 7, 21]]
+    distance, azimuth = olutil.inverse_geodesic(
+        origin_lat, origin_long, picked['latitude'].to_numpy(),
+        picked['longitude'].to_numpy())
+    x = distance * np.sin(np.radians(azimuth)) + [2, -3, 1]
+    y = distance * np.cos(np.radians(azimuth)) + [1, 2, -4]
+    rng = np.random.default_rng(0)
+    x = np.concatenate((x, rng.uniform(-800, 800, 20)))
+    y = np.concatenate((y, rng.uniform(-800, 800, 20)))
+    design = pd.DataFrame({'x': x, 'y': y},
+                          index=pd.Index(np.arange(1, 24), name='anchor'))
+    matches = olutil.match_anchors(design, [path], origin_lat, origin_long)
+    assert matches['surveyed_name'].tolist()[:3] == \
+        picked['given_name'].tolist()
+    assert (matches['offset'][:3] < 5).all()
+    assert (matches['source'] == str(path)).all()
+    # Nearest by geodesic length, point by point
+    for anchor, match in matches.iterrows():
+        lengths, _ = olutil.inverse_geodesic(
+            np.full(len(surveyed), match['latitude']),
+            np.full(len(surveyed), match['longitude']),
+            surveyed['latitude'].to_numpy(),
+            surveyed['longitude'].to_numpy())
+        assert np.isclose(match['offset'], lengths.min())
+
+
+def test_design_anchors_of_config():
+    config = SimpleNamespace(
+        anchor_config=pd.DataFrame({'Anker': [2, 1]}),
+        node_index={1: 0, 2: 2, 301: 1},
+        node_pos=np.array([[10.0, 20.0, -50.0], [0.0, 0.0, -7.0],
+                           [-30.0, 5.0, -60.0]]))
+    anchors = olutil.design_anchors(config)
+    assert anchors.index.tolist() == [2, 1]
+    assert anchors.to_numpy().tolist() == [[-30, 5], [10, 20]]
@@ -0,0 +1,120 @@
+import io
+import numpy as np
+import pytest
+from amoor import read_avz, synthetic
+
+
+def _file(text):
+    return io.BytesIO(text.encode('Latin-1'))
+
+
+def test_vertex_block():
+    ids, positions = read_avz._read_vertex_block(_file(
+        '0 0 1.0 2.0 -3.0\n1 0 4.0 5.0 -6.0\n}\n'))
+    assert ids.tolist() == [0, 1]
+    assert positions.tolist() == [[1, 2, -3], [4, 5, -6]]
+
+
+def test_vertex_block_with_extra_column():
+    ids, positions = read_avz._read_vertex_block(_file(
+        '0 0 1.0 2.0 -3.0\n1 0 4.0 5.0 -6.0 7.0\n}\n'))
+    assert ids.tolist() == [0, 1]
+    assert positions.tolist() == [[1, 2, -3], [4, 5, -6]]
+
+
+def test_vertex_block_with_missing_column():
+    # 4 + 6 tokens divide evenly by 2 lines, but the columns are shifted
+    with pytest.raises(ValueError):
+        read_avz._read_vertex_block(_file(
+            '0 1.0 2.0 -3.0\n1 0 4.0 5.0 -6.0 7.0\n}\n'))
+
+
+def _stress_block(text):
+    '''Ragged block of the STRESS_LINE_LIST bodies in text.'''
+    block = read_avz._new_block()
+    file = _file(text)
+    for line in file:
+        read_avz._read_stress_block(file, block)
+    return read_avz._ragged_block(block)
+
+
+def test_line_block():
+    edges = read_avz._new_block(columns=2)
+    read_avz._read_line_block(_file(
+        'COMPONENT 7\nLINE_THICKNESS 1\n0 - 1\n1 - 2\n}\n'), edges)
+    assert edges['elements'] == [b'7']
+    read_avz._parse_pending(edges)
+    assert edges['values'][0].tolist() == [0, 1, 1, 2]
+    assert edges['counts'] == [4]
+
+
+def test_line_block_with_ragged_lines():
+    edges = read_avz._new_block(columns=2)
+    read_avz._read_line_block(_file(
+        'COMPONENT 7\nLINE_THICKNESS 1\n0 - 1\n1 - 2\n}\n'), edges)
+    read_avz._read_line_block(_file(
+        'COMPONENT 8\nLINE_THICKNESS 1\n5 0 - 1\n1 - 2 3\n}\n'), edges)
+    read_avz._parse_pending(edges)
+    assert np.concatenate(edges['values']).tolist() == [0, 1, 1, 2,
+                                                        0, 1, 2, 3]
+    assert edges['counts'] == [4, 4]
+
+
+def test_stress_blocks_take_last_column():
+    block = _stress_block('{\nELEMENT 12\n0 1.5 2.5\n1 3.5 4.5\n}\n'
+                          '{\nELEMENT 3\n0 7.0 8.0\n}\n')
+    assert block['id'].tolist() == [3, 12]
+    assert block['values'].tolist() == [8.0, 2.5, 4.5]
+    assert block['offsets'].tolist() == [0, 1, 3]
+
+
+def test_stress_blocks_of_ragged_lines():
+    # 4 + 2 tokens divide evenly by 2 lines, the last columns are 4 and 6
+    block = _stress_block('{\nELEMENT 12\n1 2 3 4\n5 6\n}\n'
+                          '{\nELEMENT 13\n0 1.0 2.0\n}\n')
+    assert block['values'].tolist() == [4, 6, 2]
+    assert block['offsets'].tolist() == [0, 2, 3]
+
+
+def test_stress_blocks_reject_text():
+    with pytest.raises(ValueError):
+        _stress_block('{\nELEMENT 1\n0 1.0\n1 abc\n}\n')
+
+
+def test_parse_chunks_give_same_values(monkeypatch):
+    text = ''.join('{{\nELEMENT {}\n0 {}.0 {}.0\n1 0.5 0.5\n}}\n'.format(
+        element, element, element) for element in range(1, 40))
+    whole = _stress_block(text)
+    monkeypatch.setattr(read_avz, 'PARSE_CHUNK', 64)
+    chunked = _stress_block(text)
+    assert np.array_equal(whole['values'], chunked['values'])
+    assert np.array_equal(whole['offsets'], chunked['offsets'])
+
+
+def test_segment_arg_matches_argmax():
+    rng = np.random.default_rng(0)
+    counts = np.array([3, 1, 4, 2])
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    values = rng.integers(0, 3, offsets[-1]).astype(np.float64)
+    block = {'id': np.arange(len(counts)), 'values': values,
+             'offsets': offsets}
+    for reduce, arg in ((np.maximum, np.argmax), (np.minimum, np.argmin)):
+        expected = [start + arg(values[start:stop])
+                    for start, stop in zip(offsets[:-1], offsets[1:])]
+        assert read_avz._segment_arg(block, reduce).tolist() == expected
+
+
+def test_segment_arg_rejects_empty_elements():
+    block = {'id': np.array([4, 5, 6]),
+             'values': np.array([1.0, 3.0, 2.0]),
+             'offsets': np.array([0, 2, 2, 3])}
+    with pytest.raises(ValueError, match=r'\[5\]'):
+        read_avz._segment_arg(block, np.maximum)
+
+
+def test_avz_to_df_of_synthetic_file(tmp_path):
+    path = tmp_path / 'PFAT.avz'
+    synthetic.write_avz(path, 20, num_elements=3, num_timesteps=6)
+    df = read_avz.avz_to_df(str(path), False, True)
+    assert len(df.index.unique('id')) == 20
+    assert (df['force'] > 0).all()
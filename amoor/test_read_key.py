@@ -0,0 +1,88 @@
+import numpy as np
+from scipy.constants import g
+from amoor import read_key
+
+KEY = '''Key file
+ Component masses
+Component 1 {0} {1} {2} 10.0
+Component 2 {3} {4} {5} 20.0
+Component 3 7 5
+Component 4 {6} {7} {8} 40.0
+
+{title}
+Component 1 0.0 1.0 -5.0
+Component 2 0.0 2.0 -6.0
+'''
+
+
+def _write(tmp_path, title=' Mass centre beams and trusses '):
+    masses = (g * np.arange(1, 10)).tolist()
+    path = tmp_path / 'key.txt'
+    path.write_text(KEY.format(*masses, title=title))
+    return path
+
+
+def test_key_to_df_skips_rows_of_other_width(tmp_path):
+    df = read_key.key_to_df(_write(tmp_path))
+    assert df.index.tolist() == [1, 2, 4]
+    assert np.allclose(df['mass_w'], [1, 4, 7])
+    assert np.allclose(df['length'], [10, 20, 40])
+
+
+def test_key_to_df_finds_decorated_title(tmp_path):
+    path = _write(tmp_path, title=' Mass centre beams and trusses [m]')
+    assert read_key.key_to_df(path).index.tolist() == [1, 2, 4]
+    centres = read_key.KeyFile(path).mass_centres()
+    assert centres.index.tolist() == [1, 2]
+    assert np.allclose(centres['z'], [-5, -6])
+
+
+def test_mixed_widths_give_no_fake_records(tmp_path):
+    # 6 + 2 tokens divide evenly by 4, but are not two rows of 3 values
+    path = tmp_path / 'key.txt'
+    path.write_text('Title\nComponent 1 2 3 4 5 6\nComponent 7 5\n')
+    ids, values = read_key.KeyFile(path).rows_before('None', width=3)
+    assert len(ids) == 0
+    ids, values = read_key.KeyFile(path).block('Title', width=5)
+    assert ids.tolist() == [1]
+    assert values.tolist() == [[2, 3, 4, 5, 6]]
+
+
+def test_key_to_df_matches_synthetic_lengths(tmp_path):
+    from amoor import synthetic
+    path = tmp_path / 'key.txt'
+    synthetic.write_key(path, 50)
+    _, starts, ends = synthetic._geometry(50, 0)
+    df = read_key.key_to_df(path)
+    assert len(df) == 50
+    assert np.allclose(np.sort(df['length']),
+                       np.sort(np.sqrt(((ends - starts) ** 2).sum(axis=1))),
+                       atol=1e-4)
+
+
+def test_rows_with_tabs_and_spaces_after_component(tmp_path):
+    path = tmp_path / 'key.txt'
+    path.write_text(' Component masses \n'
+                    'Component  1 9.81 19.62 9.81 1.0\n'
+                    'Component\t2 9.81 19.62 9.81 2.0\n'
+                    'Component 3 9.81 19.62 9.81 3.0\n'
+                    '  Component 4 9.81 19.62 9.81 4.0\n'
+                    'Components total 4\n')
+    df = read_key.key_to_df(path)
+    assert df.index.tolist() == [1, 2, 3, 4]
+    assert np.allclose(df['length'], [1, 2, 3, 4])
+
+
+def test_line_table_follows_row_pattern():
+    rng = np.random.default_rng(1)
+    pieces = ['', ' ', '\t', '  ', '\r', 'Component', 'Components', 'x',
+              '1', '7.5', '-2', '\x0b']
+    lines = [''.join(rng.choice(pieces, rng.integers(0, 6)))
+             for _ in range(3000)]
+    text = '\n'.join(lines).encode('Latin-1')
+    starts, ends, is_row = read_key._line_table(text)
+    assert len(starts) == len(lines)
+    expected = [bool(read_key._row_pat.match(text[start:end]))
+                for start, end in zip(starts, ends)]
+    assert is_row.tolist() == expected
+    assert any(expected)
@@ -0,0 +1,32 @@
+import zipfile
+import numpy as np
+from amoor import synthetic, read_avz, read_key
+
+
+def test_key_has_layout_of_analysis(tmp_path):
+    # The layout read_key was written for: rows of 4 values in the blocks
+    # before the line with ' Mass centre beams and trusses ', and rows of
+    # another width after it
+    path = tmp_path / 'key.txt'
+    synthetic.write_key(path, 20)
+    lines = path.read_text().splitlines()
+    stop = [number for number, line in enumerate(lines)
+            if ' Mass centre beams and trusses ' in line]
+    assert len(stop) == 1
+    widths = [len(line.split()) for line in lines if 'Component' in line]
+    before = [len(line.split()) for line in lines[:stop[0]]
+              if 'Component' in line]
+    assert before.count(6) == 20
+    assert widths.count(6) == 20
+
+
+def test_avz_matches_key(tmp_path):
+    avz_path = tmp_path / 'PFAT.avz'
+    key_path = tmp_path / 'key.txt'
+    synthetic.write_avz(avz_path, 30, num_timesteps=5, seed=1)
+    synthetic.write_key(key_path, 30)
+    assert 'model.avs' in zipfile.ZipFile(avz_path).namelist()
+    df_avz = read_avz.avz_to_df(str(avz_path), False, True)
+    df_key = read_key.key_to_df(str(key_path))
+    assert np.array_equal(np.sort(df_avz.index.unique('id')),
+                          np.sort(df_key.index))
@@ -0,0 +1,29 @@
+import numpy as np
+from amoor import util
+
+
+def _direction(degrees, numeric=True):
+    '''Sector of one angle in 0-360, by the original interval loop.'''
+    intervals = [22.5, 67.5, 112.5, 157.5, 202.5, 247.5, 292.5, 337.5]
+    names = list(range(1, 9)) if numeric else util.SECTOR_LABELS[8]
+    for i in range(len(intervals) - 1):
+        if intervals[i] <= degrees < intervals[i + 1]:
+            return names[i + 1]
+    return names[0]
+
+
+def test_sectors_match_interval_loop():
+    degrees = np.concatenate((np.arange(0, 360, 0.25),
+                              [22.5, 67.5, 337.5, 359.999]))
+    assert util.sectors(degrees).tolist() == [_direction(d) for d in degrees]
+    assert (util.sectors(degrees, numeric=False).tolist()
+            == [_direction(d, False) for d in degrees])
+
+
+def test_sectors_wrap_around():
+    assert util.sectors([-10, 360, 370, 725, -337.5, 337.4]).tolist() == \
+        [1, 1, 1, 1, 2, 8]
+    assert util.sectors([348.75, 11.24, 11.25, -11.25], 16).tolist() == \
+        [1, 1, 2, 1]
+    assert util.sectors([np.nan]).tolist() == [1]
+    assert util.direction(-45, numeric=False) == 'NV'
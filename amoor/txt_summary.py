@@ -74,6 +74,17 @@ if __name__ == '__main__':
     for arg in max_val_args:
         key_vals(key_data, *arg)
 
+    # Fatigue sheet is only there when the summary was given cycles
+    key_data["fatigue_segment"] = "_"
+    key_data["fatigue_id"] = "_"
+    key_data["fatigue_life"] = "_"
+    if "fatigue" in pd.ExcelFile(both_path).sheet_names:
+        fatigue = pd.read_excel(both_path, sheet_name="fatigue")
+        worst = fatigue.iloc[0]
+        key_data["fatigue_segment"] = worst.segment.capitalize()
+        key_data["fatigue_id"] = worst.component
+        key_data["fatigue_life"] = f"{worst.life:.0f}"
+
     with open("amoor/summary_template.txt", "r") as file:
         content = file.read()
 
@@ -1,10 +1,57 @@
-def direction(degrees, numeric=True):
-    intervals = [22.5, 67.5, 112.5, 157.5, 202.5, 247.5, 292.5, 337.5]
+import warnings
+import numpy as np
+
+SECTOR_LABELS = {
+    8: ['N', 'NØ', 'Ø', 'SØ', 'S', 'SV', 'V', 'NV'],
+    16: ['N', 'NNØ', 'NØ', 'ØNØ', 'Ø', 'ØSØ', 'SØ', 'SSØ',
+         'S', 'SSV', 'SV', 'VSV', 'V', 'VNV', 'NV', 'NNV']
+}
+
+
+def sectors(degrees, num_sectors=8, numeric=True):
+    '''Sector of every angle in degrees, an array or column of compass
+    directions. Sectors are num_sectors (8 or 16) equally wide, and sector
+    1, N, is centred on north. Angles are wrapped to 0-360, and NaN falls
+    in sector 1. Returns array of sector numbers from 1, or of Norwegian
+    labels if numeric is False.'''
+    labels = SECTOR_LABELS[num_sectors]
+    width = 360 / num_sectors
+    edges = width / 2 + width * np.arange(num_sectors)
+    index = np.digitize(np.mod(np.asarray(degrees, dtype=np.float64), 360),
+                        edges) % num_sectors
     if numeric:
-        interval_name = [1, 2, 3, 4, 5, 6, 7, 8]
-    else:
-        interval_name = ['N', 'NØ', 'Ø', 'SØ', 'S', 'SV', 'V', 'NV']
-    for i in range(0,len(intervals)-1):
-        if intervals[i] <= degrees < intervals[i+1]:
-            return interval_name[i+1]
-    return interval_name[0]
\ No newline at end of file
+        return index + 1
+    return np.array(labels, dtype=object)[index]
+
+
+def direction(degrees, numeric=True):
+    '''Sector of one angle, as by sectors with 8 sectors.'''
+    return sectors([degrees], 8, numeric).tolist()[0]
+
+
+def token_counts(text, starts, ends):
+    '''Number of whitespace separated tokens on each line of text, bytes,
+    for lines starting at starts and ending at ends. Counted for all lines
+    together, from the token starts in text.'''
+    codes = np.frombuffer(text, dtype=np.uint8)
+    is_space = (codes == ord(' ')) | ((codes >= 9) & (codes <= 13))
+    is_token_start = ~is_space
+    is_token_start[1:] &= is_space[:-1]
+    token_starts = np.flatnonzero(is_token_start)
+    return (np.searchsorted(token_starts, ends)
+            - np.searchsorted(token_starts, starts))
+
+
+def parse_numbers(text, count):
+    '''The count numbers of text, bytes separated by whitespace, as an
+    array. Parsed in one call, or token by token if that does not give
+    count numbers, which raises ValueError for tokens that are not
+    numbers.'''
+    with warnings.catch_warnings():
+        # fromstring stops at the first token that is not a number
+        warnings.simplefilter('ignore', DeprecationWarning)
+        numbers = np.fromstring(text, dtype=np.float64, sep=' ')
+    if len(numbers) != count:
+        numbers = np.array([float(token) for token in text.split()],
+                           dtype=np.float64)
+    return numbers
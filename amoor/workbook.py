@@ -0,0 +1,92 @@
+"""
+Workbook writer for the max summary files.
+
+write_workbook writes sheets either through pandas.ExcelWriter, or with a
+fast writer that streams the rows of each sheet with xlsxwriter in
+constant memory mode. The fast writer keeps the pandas layout: header
+rows, index columns and merged labels of column levels. Repeated index
+labels are written on every row instead of being merged, since merged
+rows can not be streamed.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+
+
+def write_workbook(path, sheets, fast=False):
+    '''Write sheets, a dict of sheet names and DataFrames, to path.
+    If fast is True, xlsxwriter streams the rows in constant memory.'''
+    if not fast:
+        with pd.ExcelWriter(path) as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name)
+        return
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(
+        str(path), {'constant_memory': True, 'nan_inf_to_errors': True}
+    )
+    # Same look as the pandas header and index cells
+    header = workbook.add_format(
+        {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+    )
+    try:
+        for name, df in sheets.items():
+            _write_sheet(workbook.add_worksheet(name), df, header)
+    finally:
+        workbook.close()
+
+
+def _cell(value):
+    '''Return value as a type xlsxwriter can write, or None if missing.'''
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _spans(columns, level):
+    '''Yield label and number of columns for each run of equal labels
+    at level of MultiIndex columns, split where higher levels change.'''
+    keys = [column[:level + 1] for column in columns]
+    for key, run in itertools.groupby(keys):
+        yield key[-1], len(list(run))
+
+
+def _write_sheet(worksheet, df, header):
+    '''Write df to worksheet row by row, in the layout of DataFrame.to_excel.'''
+    num_index = df.index.nlevels
+    row = 0
+    if df.columns.nlevels > 1:
+        for level, level_name in enumerate(df.columns.names):
+            worksheet.write(row, num_index - 1, _cell(level_name), header)
+            col = num_index
+            for label, span in _spans(df.columns, level):
+                if span > 1:
+                    worksheet.merge_range(row, col, row, col + span - 1,
+                                          _cell(label), header)
+                else:
+                    worksheet.write(row, col, _cell(label), header)
+                col += span
+            row += 1
+        if any(name is not None for name in df.index.names):
+            worksheet.write_row(
+                row, 0, [_cell(name) for name in df.index.names], header
+            )
+            row += 1
+    else:
+        worksheet.write_row(
+            row, 0, [_cell(name) for name in df.index.names], header
+        )
+        worksheet.write_row(
+            row, num_index, [_cell(label) for label in df.columns], header
+        )
+        row += 1
+
+    for label, values in zip(df.index, df.itertuples(index=False, name=None)):
+        labels = label if num_index > 1 else (label,)
+        worksheet.write_row(row, 0, [_cell(value) for value in labels], header)
+        worksheet.write_row(row, num_index, [_cell(value) for value in values])
+        row += 1
@@ -1,17 +1,14 @@
 import sys
 import logging
+import argparse
+import traceback
 from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from pathlib import Path
-from amoor import read_avz, read_key, merge, max_summary
+from amoor import read_avz, read_key, merge, max_summary, manifest, workbook
+from amoor import force_history, fatigue
 
-tic = perf_counter()
-logging.basicConfig(level=logging.DEBUG,
-                    filename='amoor.log',
-                    filemode='a',
-                    format='%(asctime)s - %(message)s',
-                    datefmt='%d-%b-%y %H:%M:%S')
-logging.info('Program started.')
 
 def path_replace(path, old_name, new_name, suffix=None):
     new_path = Path(str(path).replace(str(old_name), str(new_name)))
@@ -22,171 +19,313 @@ def path_replace(path, old_name, new_name, suffix=None):
     return new_path.parent / child
 
 
-def file_is_updated(read_path, write_path):
-    '''
-    Returns True if file at read_path is modified
-    more recently than file file at write_path.
-    '''
-    if write_path.exists():
-        # Mod time will be larger for the file that is modified last.
-        return read_path.stat().st_mtime < write_path.stat().st_mtime
-    else:
-        return False
-
-
-def summary_is_updated(summary_path, sub_paths):
-    '''
-    Returns True if file at summary_path is modified
-    more recently than all files in sub_paths.
-    '''
-    if summary_path.exists():
-        return all([
-            summary_path.stat().st_mtime > sub_path.stat().st_mtime
-            for sub_path in sub_paths])
-    else:
-        return False
-
-
 SOURCE_ROOT = Path('../Resultater')
 DEST_ROOT = Path('Output')
 MATERIAL_LIB_PATH = Path('amoor/all_materials.csv')
 MOD_FILE = 'modify.xlsx'
+FATIGUE_FILE = 'fatigue.xlsx'  # Columns lt and cycles (per year)
+MANIFEST_PATH = DEST_ROOT / 'manifest.json'
 is_nice = True
-material_lib = pd.read_csv(MATERIAL_LIB_PATH, index_col='Forkortelse')
-
-pfat_sources = [path for path in SOURCE_ROOT.glob('**/*PFAT.avz')
-                if 'max_' not in str(path)]
-pfat_dest = [path_replace(path, SOURCE_ROOT, DEST_ROOT, '.csv')
-            for path in pfat_sources]
-key_sources = list(SOURCE_ROOT.glob('**/*key.txt'))
-key_dest = [path_replace(path, SOURCE_ROOT, DEST_ROOT, '.csv')
-            for path in key_sources]
-merged_dest = [path_replace(pfat_csv, 'PFAT', 'merged')
-            for pfat_csv in pfat_dest]
-dest_dirs = [path_replace(folder, SOURCE_ROOT, DEST_ROOT)
-            for folder in SOURCE_ROOT.glob('**/')
-            if str(folder) != str(SOURCE_ROOT)
-            if 'max_' not in str(folder)
-            if list(folder.glob('*'))]  # Ignore empty folders
-mod_sources = SOURCE_ROOT.glob('**/' + MOD_FILE)
-DEST_ROOT.mkdir(exist_ok=True)
-for folder in dest_dirs:
-    folder.mkdir(exist_ok=True)
-
-# Parse PFATs
-for pfat_avz in pfat_sources:
-    pfat_csv = path_replace(pfat_avz, SOURCE_ROOT, DEST_ROOT, '.csv')
-    if file_is_updated(pfat_avz, pfat_csv):
-        continue
+priorities = ['utilization', 'load', 'mbl_bound',
+            'min_zload', 'max_zload']
+buildup_cols = ['material', 'length', 'utilization']
+buildup_segments = ['Bunnkjetting', 'Tau', 'Toppkjetting']
+
+
+def parse_pfat(pfat_avz, pfat_csv, csv_copy=False, history=False):
+    '''Parse PFAT .avz-file to csv or feather. If history is True, the
+    force history is written next to it, in the same pass.
+    Returns log lines.'''
     pfat_avz_str = str(pfat_avz)
+    avs = None
+    if history:
+        writer = force_history.HistoryWriter(
+            force_history.history_path(pfat_csv))
+        try:
+            avs = read_avz._read_avs(pfat_avz_str, history=writer)
+        except BaseException:
+            # A history of part of the file is not written
+            writer.abort()
+            raise
+        writer.close()
     if 'ulykke' in pfat_avz_str.lower():
-        log_txt = pfat_avz_str + ' parsed as accident.'
-        logging.info(log_txt)
-        print(log_txt)
-        df = read_avz.avz_to_df(pfat_avz_str, True, is_nice)
-        df.to_csv(pfat_csv)
+        df = read_avz.avz_to_df(pfat_avz_str, True, is_nice, avs)
+        merge.write_result(df, pfat_csv, csv_copy)
+        return [pfat_avz_str + ' parsed as accident.']
     else:
-        log_txt = pfat_avz_str + ' parsed as intact.'
-        logging.info(log_txt)
-        print(log_txt)
-        df = read_avz.avz_to_df(pfat_avz_str, False, is_nice)
-        df.to_csv(pfat_csv)
-
-# Parse key-files
-for key_txt in key_sources:
-    key_csv = path_replace(key_txt, SOURCE_ROOT, DEST_ROOT, '.csv')
-    if file_is_updated(key_txt, key_csv):
-        continue
+        df = read_avz.avz_to_df(pfat_avz_str, False, is_nice, avs)
+        merge.write_result(df, pfat_csv, csv_copy)
+        return [pfat_avz_str + ' parsed as intact.']
+
+
+def parse_key(key_txt, key_csv, csv_copy=False):
+    '''Parse key.txt-file to csv or feather. Returns log lines.'''
     key_txt_str = str(key_txt)
-    log_txt = key_txt_str + ' parsed.'
-    logging.info(log_txt)
-    print(log_txt)
     df = read_key.key_to_df(key_txt_str)
-    df.to_csv(key_csv)
+    merge.write_result(df, key_csv, csv_copy)
+    return [key_txt_str + ' parsed.']
+
 
-# Merge PFATs og keys
-for pfat, key in zip(pfat_dest, key_dest):
-    merged = path_replace(pfat, 'PFAT', 'merged')
-    if file_is_updated(pfat, merged) and file_is_updated(key, merged):
-        continue
+def merge_pair(pfat, key, merged, csv_copy=False):
+    '''Merge parsed PFAT and key files. Returns log lines.'''
     pfat_str = str(pfat)
     key_str = str(key)
     log_txt = 'Merging ' + pfat_str + ' and ' + key_str + '...'
-    logging.info(log_txt)
-    print(log_txt)
     df = merge.merge(pfat_str, key)
-    df.to_csv(merged)
-
-# Modify merged files
-if mod_sources:
-    for mod_path in mod_sources:
-        mod_df = pd.read_excel(mod_path)
-        mod_df.set_index('id', inplace=True)
-        dest_path = path_replace(mod_path, SOURCE_ROOT, DEST_ROOT)
-        dest_path = path_replace(dest_path, MOD_FILE, '')
-        merged_paths = dest_path.glob('**/*merged.csv')
-        for merged_path in merged_paths:
-            # if file_is_younger(merged_path, mod_path):
-                # continue
-            print("Modifying {}...".format(merged_path))
-            merged_df = pd.read_csv(merged_path)
-            merged_df.to_csv(
-                path_replace(merged_path, 'merged', 'merged_premod')
-            )
-            merged_df.set_index('id', inplace=True)
-            merged_df = merged_df.loc[mod_df.index]
-            merged_df['segment'] = mod_df['segment']
-            merged_df['component'] = mod_df['component']
-            merged_df['material'] = mod_df['material']
-            merged_df.to_csv(merged_path)
-
-# Make max files
-priorities = ['utilization', 'load', 'mbl_bound',
-            'min_zload', 'max_zload']
-buildup_cols = ['material', 'length', 'utilization']
-buildup_segments = ['Bunnkjetting', 'Tau', 'Toppkjetting']
-for folder in dest_dirs:
-    # Paths
-    max_dest = DEST_ROOT / ('-'.join(folder.parts[1:]) + '.xlsx')
-    merged_sub_paths = list(folder.glob('**/*merged.csv'))
-    # Check mod times
-    if summary_is_updated(max_dest, merged_sub_paths):
-        continue
+    merge.write_result(df, merged, csv_copy)
+    return [log_txt]
+
+
+def make_summary(max_dest, merged_sub_paths, fast_excel=False,
+                 fatigue_path=None):
+    '''Write max summary workbook of merged_sub_paths to max_dest.
+    With fast_excel, the rows are streamed by the fast writer. With
+    fatigue_path, the elements with most fatigue damage get a sheet.
+    Returns log lines.'''
     log_txt = 'Making ' + str(max_dest) + '...'
-    logging.info(log_txt)
-    print(log_txt)
-    with pd.ExcelWriter(max_dest) as writer:
-        df_max = max_summary.summarize(merged_sub_paths)
-        df_max = max_summary.reorder_to_store_order(df_max)  # Reorder columns
-        df_max.to_excel(writer, sheet_name='result')
-        df_describe = df_max.groupby('segment')[priorities].describe().round(1)
-        for priority in priorities:    
-            df_util = max_summary.prioritize_components(df_max, priority, 10)
-            df_util.to_excel(writer, sheet_name=priority)
-        # Right web will be all 0.0 entries for LV results
-        if (df_max.right_web != 0).all():
-            df_util = max_summary.prioritize_components(df_max,
-                                                        'right_web',
-                                                        10)
-            df_util.to_excel(writer, sheet_name='right_web')
-        df_buildup = max_summary.pivot_config(df_max,
-                                            buildup_segments,
-                                            buildup_cols)
-        df_buildup.to_excel(writer, sheet_name='buildup')
-        df_materials = material_lib.loc[df_max.material.unique()]
-        df_materials.sort_index(inplace=True)
-        df_materials.to_excel(writer, sheet_name='materials')
-        df_material_matrix = max_summary.material_matrix(df_max)
-        df_material_matrix.to_excel(writer, sheet_name='material_matrix')
-        df_pluck = max_summary.components_by_material(df_max)
-        df_pluck.to_excel(writer, sheet_name='pluck_list')
-        df_sources = pd.DataFrame(merged_sub_paths,
-                            columns=['source'],
-                            index=range(1, len(merged_sub_paths)+1))
-        df_describe.to_excel(writer, sheet_name='describe')
-        df_sources.to_excel(writer, sheet_name='sources')
-
-print('Done!')
-logging.info('Program terminated.')
-toc = perf_counter()
-logging.info(f'Execution time: {toc-tic:3.1f} s.')
\ No newline at end of file
+    material_lib = pd.read_csv(MATERIAL_LIB_PATH, index_col='Forkortelse')
+    sheets = {}
+    df_max = max_summary.summarize(merged_sub_paths)
+    df_max = max_summary.reorder_to_store_order(df_max)  # Reorder columns
+    sheets['result'] = df_max
+    df_describe = df_max.groupby('segment')[priorities].describe().round(1)
+    for priority in priorities:
+        df_util = max_summary.prioritize_components(df_max, priority, 10)
+        sheets[priority] = df_util
+    # Right web will be all 0.0 entries for LV results
+    if (df_max.right_web != 0).all():
+        df_util = max_summary.prioritize_components(df_max,
+                                                    'right_web',
+                                                    10)
+        sheets['right_web'] = df_util
+    df_buildup = max_summary.pivot_config(df_max,
+                                        buildup_segments,
+                                        buildup_cols)
+    sheets['buildup'] = df_buildup
+    df_materials = material_lib.loc[df_max.material.unique()]
+    df_materials.sort_index(inplace=True)
+    sheets['materials'] = df_materials
+    df_material_matrix = max_summary.material_matrix(df_max)
+    sheets['material_matrix'] = df_material_matrix
+    df_pluck = max_summary.components_by_material(df_max)
+    sheets['pluck_list'] = df_pluck
+    df_sources = pd.DataFrame(merged_sub_paths,
+                        columns=['source'],
+                        index=range(1, len(merged_sub_paths)+1))
+    sheets['describe'] = df_describe
+    sheets['sources'] = df_sources
+    if fatigue_path:
+        cycles = pd.read_excel(fatigue_path, index_col='lt')['cycles']
+        damage = fatigue.right_web_damage(merged_sub_paths, cycles.to_dict())
+        sheets['fatigue'] = fatigue.fatigue_table(damage, df_max, 10)
+    workbook.write_workbook(max_dest, sheets, fast_excel)
+    return [log_txt]
+
+
+def _run_job(task):
+    '''Run task, a tuple of function and arguments, and return its
+    log lines. Errors are returned as log lines instead of raised,
+    so that one bad file does not stop the run.'''
+    func, args = task
+    try:
+        return True, func(*args)
+    except Exception:
+        return False, ['Failed {}{}:\n{}'.format(
+            func.__name__, tuple(str(arg) for arg in args),
+            traceback.format_exc())]
+
+
+def run_jobs(tasks, jobs=1):
+    '''Run tasks, a list of (function, arguments) tuples, in a process
+    pool with jobs workers, or in this process if jobs is 1. Log lines
+    are written in task order, each task's lines kept together.
+    Returns a list with True for each task that succeeded.'''
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            outcomes = executor.map(_run_job, tasks)
+            return _log_outcomes(outcomes)
+    else:
+        return _log_outcomes(map(_run_job, tasks))
+
+
+def _log_outcomes(outcomes):
+    '''Log and print the lines of each outcome, as they arrive.'''
+    succeeded = []
+    for is_ok, log_lines in outcomes:
+        for log_txt in log_lines:
+            if is_ok:
+                logging.info(log_txt)
+            else:
+                logging.error(log_txt)
+            print(log_txt)
+        succeeded.append(is_ok)
+    return succeeded
+
+
+def _schedule(build_manifest, tasks, stale, dry_run):
+    '''Keep the (outputs, inputs, function, arguments) tasks where any
+    of the outputs needs a build. In a dry run, outputs are listed and
+    added to stale instead, so that dependent outputs are listed too.'''
+    scheduled = [task for task in tasks
+                 if any(build_manifest.needs_build(output, task[1], stale)
+                        for output in task[0])]
+    if dry_run:
+        for outputs, inputs, _, _ in scheduled:
+            for output in outputs:
+                print('Would rebuild {}'.format(output))
+                stale.add(str(output))
+        return []
+    return scheduled
+
+
+def _build(build_manifest, tasks, jobs):
+    '''Run scheduled tasks and record the successful ones.'''
+    if not tasks:
+        return
+    succeeded = run_jobs([(func, args) for _, _, func, args in tasks], jobs)
+    for (outputs, inputs, _, _), is_ok in zip(tasks, succeeded):
+        if is_ok:
+            for output in outputs:
+                build_manifest.record(output, inputs)
+    build_manifest.save()
+
+
+def main(jobs=1, dry_run=False, suffix='.csv', csv_copy=False,
+         fast_excel=False, history=False):
+    '''Build all outputs. Intermediate files are written with suffix,
+    either .csv or .feather. With csv_copy, feather files get a csv
+    copy for reading in Excel. With fast_excel, summary workbooks are
+    written by the fast writer. With history, the force history of
+    every parsed PFAT is written next to it.'''
+    pfat_sources = [path for path in SOURCE_ROOT.glob('**/*PFAT.avz')
+                    if 'max_' not in str(path)]
+    pfat_dest = [path_replace(path, SOURCE_ROOT, DEST_ROOT, suffix)
+                for path in pfat_sources]
+    key_sources = list(SOURCE_ROOT.glob('**/*key.txt'))
+    key_dest = [path_replace(path, SOURCE_ROOT, DEST_ROOT, suffix)
+                for path in key_sources]
+    merged_dest = [path_replace(pfat_csv, 'PFAT', 'merged')
+                for pfat_csv in pfat_dest]
+    dest_dirs = [path_replace(folder, SOURCE_ROOT, DEST_ROOT)
+                for folder in SOURCE_ROOT.glob('**/')
+                if str(folder) != str(SOURCE_ROOT)
+                if 'max_' not in str(folder)
+                if list(folder.glob('*'))]  # Ignore empty folders
+    mod_sources = SOURCE_ROOT.glob('**/' + MOD_FILE)
+    if not dry_run:
+        DEST_ROOT.mkdir(exist_ok=True)
+        for folder in dest_dirs:
+            folder.mkdir(exist_ok=True)
+    build_manifest = manifest.Manifest(MANIFEST_PATH)
+    stale = set()  # Outputs that a dry run would rebuild
+
+    # Parse PFATs and key-files. They are independent of each other.
+    parse_tasks = []
+    for pfat_avz, pfat_csv in zip(pfat_sources, pfat_dest):
+        outputs = [pfat_csv]
+        if history:
+            # A missing history forces a parse of a built tree
+            outputs.append(force_history.history_path(pfat_csv))
+        parse_tasks.append(
+            (outputs, [pfat_avz], parse_pfat,
+             (pfat_avz, pfat_csv, csv_copy, history)))
+    for key_txt, key_csv in zip(key_sources, key_dest):
+        parse_tasks.append(
+            ([key_csv], [key_txt], parse_key, (key_txt, key_csv, csv_copy)))
+    parse_tasks = _schedule(build_manifest, parse_tasks, stale, dry_run)
+    _build(build_manifest, parse_tasks, jobs)
+
+    # Merge PFATs og keys
+    merge_tasks = []
+    for pfat, key, merged in zip(pfat_dest, key_dest, merged_dest):
+        merge_tasks.append(
+            ([merged], [pfat, key], merge_pair,
+             (pfat, key, merged, csv_copy)))
+    merge_tasks = _schedule(build_manifest, merge_tasks, stale, dry_run)
+    _build(build_manifest, merge_tasks, jobs)
+
+    # Modify merged files
+    if mod_sources and not dry_run:
+        for mod_path in mod_sources:
+            mod_df = pd.read_excel(mod_path)
+            mod_df.set_index('id', inplace=True)
+            dest_path = path_replace(mod_path, SOURCE_ROOT, DEST_ROOT)
+            dest_path = path_replace(dest_path, MOD_FILE, '')
+            merged_paths = dest_path.glob('**/*merged' + suffix)
+            for merged_path in merged_paths:
+                # if file_is_younger(merged_path, mod_path):
+                    # continue
+                print("Modifying {}...".format(merged_path))
+                merged_df = merge.read_result(merged_path)
+                merge.write_result(
+                    merged_df,
+                    path_replace(merged_path, 'merged', 'merged_premod')
+                )
+                merged_df = merged_df.loc[mod_df.index]
+                merged_df['segment'] = mod_df['segment']
+                merged_df['component'] = mod_df['component']
+                merged_df['material'] = mod_df['material']
+                merge.write_result(merged_df, merged_path, csv_copy)
+                build_manifest.forget(merged_path)
+
+    # Make max files
+    summary_tasks = []
+    for folder in dest_dirs:
+        # Paths
+        max_dest = DEST_ROOT / ('-'.join(folder.parts[1:]) + '.xlsx')
+        merged_sub_paths = list(folder.glob('**/*merged' + suffix))
+        if dry_run:
+            # Merged files that are not made yet
+            merged_sub_paths += [path for path in merged_dest
+                                 if folder in path.parents
+                                 if not path.exists()]
+        summary_inputs = list(merged_sub_paths)
+        fatigue_path = path_replace(folder, DEST_ROOT, SOURCE_ROOT) / FATIGUE_FILE
+        if fatigue_path.exists():
+            summary_inputs.append(fatigue_path)
+        else:
+            fatigue_path = None
+        summary_tasks.append(([max_dest], summary_inputs, make_summary,
+                              (max_dest, merged_sub_paths, fast_excel,
+                               fatigue_path)))
+    summary_tasks = _schedule(build_manifest, summary_tasks, stale, dry_run)
+    _build(build_manifest, summary_tasks, jobs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Parse, merge and summarize results in '
+                    + str(SOURCE_ROOT) + ' to ' + str(DEST_ROOT) + '.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes (default: 1)')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='list what would be rebuilt, and exit')
+    parser.add_argument('-f', '--format', choices=['csv', 'feather'],
+                        default='csv',
+                        help='format of intermediate files (default: csv)')
+    parser.add_argument('--export-csv', action='store_true',
+                        help='write csv copies of feather intermediates')
+    parser.add_argument('--fast-excel', action='store_true',
+                        help='stream summary workbooks with xlsxwriter')
+    parser.add_argument('--history', action='store_true',
+                        help='write axial force history of parsed PFATs')
+    args = parser.parse_args()
+    suffix = '.' + args.format
+    if args.dry_run:
+        main(args.jobs, True, suffix, args.export_csv, args.fast_excel,
+             args.history)
+        sys.exit()
+
+    tic = perf_counter()
+    logging.basicConfig(level=logging.DEBUG,
+                        filename='amoor.log',
+                        filemode='a',
+                        format='%(asctime)s - %(message)s',
+                        datefmt='%d-%b-%y %H:%M:%S')
+    logging.info('Program started.')
+    main(args.jobs, False, suffix, args.export_csv, args.fast_excel,
+         args.history)
+    print('Done!')
+    logging.info('Program terminated.')
+    toc = perf_counter()
+    logging.info(f'Execution time: {toc-tic:3.1f} s.')